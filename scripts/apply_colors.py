@@ -3,18 +3,12 @@
 Apply color palette to REAPER theme config.
 """
 
-import re
 from pathlib import Path
 
-THEME_PATH = Path(__file__).parent.parent / "build" / "Default_7.0_DarkMinimal_unpacked.ReaperTheme"
+from image_store import read_file, write_file
+from reaper_theme import COLOR_SECTION, REAPER_SECTION, ReaperTheme, hex_to_reaper
 
-def hex_to_reaper(hex_color: str) -> int:
-    """Convert hex color (#RRGGBB) to REAPER RGB decimal format"""
-    hex_color = hex_color.lstrip('#')
-    r = int(hex_color[0:2], 16)
-    g = int(hex_color[2:4], 16)
-    b = int(hex_color[4:6], 16)
-    return r + (g * 256) + (b * 65536)
+THEME_PATH = Path(__file__).parent.parent / "build" / "Default_7.0_DarkMinimal_unpacked.ReaperTheme"
 
 # =============================================================================
 # FIGMA DARK MINIMAL PALETTE
@@ -207,37 +201,27 @@ COLOR_MAPPINGS = {
 def apply_colors():
     """Apply color palette to .ReaperTheme file"""
     
-    with open(THEME_PATH, 'r') as f:
-        content = f.read()
+    theme = ReaperTheme(read_file(THEME_PATH).decode())
     
     # Update transport font - make smaller (F3 = -13 -> F6 = -10)
     # Original: F3FFFFFF... (size -13)
     # New:      F6FFFFFF... (size -10)
-    content = re.sub(
-        r"(trans_font=)F3FFFFFF",
-        r"\1F6FFFFFF",
-        content
-    )
-    
-    changes = 0
-    for theme_var, palette_key in COLOR_MAPPINGS.items():
-        hex_color = PALETTE[palette_key]
-        reaper_val = hex_to_reaper(hex_color)
-        
-        # Match pattern: theme_var=number (key=value format in .ReaperTheme)
-        pattern = rf"^({theme_var})=(-?\d+)"
-        
-        def replacer(m):
-            nonlocal changes
-            changes += 1
-            return f"{m.group(1)}={reaper_val}"
-        
-        content = re.sub(pattern, replacer, content, flags=re.MULTILINE)
-    
-    with open(THEME_PATH, 'w') as f:
-        f.write(content)
+    trans_font = theme.get(REAPER_SECTION, "trans_font", "")
+    if trans_font.startswith("F3FFFFFF"):
+        theme.set(REAPER_SECTION, "trans_font", "F6FFFFFF" + trans_font[8:])
+    
+    values = {
+        theme_var: hex_to_reaper(PALETTE[palette_key])
+        for theme_var, palette_key in COLOR_MAPPINGS.items()
+    }
+    missing = theme.update(COLOR_SECTION, values)
+    changes = len(values) - len(missing)
+    
+    write_file(THEME_PATH, theme.serialize().encode())
     
     print(f"✓ Applied {changes} color changes")
+    if missing:
+        print(f"  ⚠ {len(missing)} mapped keys not in theme: {', '.join(missing)}")
     print(f"  Palette: {len(PALETTE)} colors defined")
     print(f"  Mappings: {len(COLOR_MAPPINGS)} theme variables")
 
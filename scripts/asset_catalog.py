@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Catalog of the theme's asset files.
+
+The asset, theme_source and build trees are each scanned once per
+process with os.scandir. Every file is recorded with its name, DPI tier
+("" for 1x, "150", "200"), size and mtime. Pattern queries are then
+answered from memory instead of re-listing or globbing the directories.
+
+Content hashes and image headers (width, height and mode from the PNG
+IHDR chunk, no pixel decoding) are read lazily, only for files that are
+asked about. They are persisted in .build_cache/asset_catalog.json
+and reused as long as a file's size and mtime are unchanged, so
+refreshing the catalog only reads files that actually changed.
+
+Stages that add or remove files under a root call refresh() on it before
+listing it again (build_all.py does so for build/ after syncing it).
+
+Usage:
+    python scripts/asset_catalog.py                  # scan and summarize
+    python scripts/asset_catalog.py "transport_*" --dpi 200
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import struct
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CATALOG_FILE = PROJECT_ROOT / ".build_cache" / "asset_catalog.json"
+
+# Trees the catalog covers
+ROOTS = [
+    PROJECT_ROOT / "assets",
+    PROJECT_ROOT / "theme_source",
+    PROJECT_ROOT / "build",
+]
+
+# Subdirectory names that hold DPI variants
+DPI_TIERS = ("150", "200")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_IHDR = struct.Struct(">4sIIBB")
+
+# PNG color type -> PIL mode (8-bit); see read_png_header for other depths
+_PNG_MODES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+
+# Bump when the persisted record layout changes
+CATALOG_VERSION = 1
+
+
+def read_png_header(path):
+    """
+    Width, height and PIL mode of a PNG from its IHDR chunk.
+
+    Returns:
+        (width, height, mode), or None if the file is not a PNG
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(8 + 4 + _IHDR.size)
+    except OSError:
+        return None
+    if len(head) < 8 + 4 + _IHDR.size or head[:8] != PNG_SIGNATURE:
+        return None
+    chunk, width, height, depth, color_type = _IHDR.unpack_from(head, 12)
+    if chunk != b"IHDR":
+        return None
+
+    mode = _PNG_MODES.get(color_type)
+    if color_type == 0 and depth == 1:
+        mode = "1"
+    elif color_type == 0 and depth == 16:
+        mode = "I;16"
+    return width, height, mode
+
+
+def _file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@dataclass(frozen=True)
+class Asset:
+    """A cataloged file, as seen by the last scan of its tree."""
+    path: Path
+    name: str
+    dpi: str
+    size: int
+    mtime_ns: int
+
+
+class AssetCatalog:
+    """In-memory file listing of the asset trees plus persisted metadata."""
+
+    def __init__(self, roots=None, path=CATALOG_FILE):
+        self.roots = [os.path.abspath(r) for r in (roots or ROOTS)]
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._dirs = {}       # absolute directory -> {name: Asset}
+        self._scanned = set()  # roots (or stray directories) scanned so far
+        self._meta = None     # project-relative path -> persisted record
+        self._dirty = False
+
+    # -- scanning ------------------------------------------------------
+
+    def _root_of(self, folder):
+        for root in self.roots:
+            if folder == root or folder.startswith(root + os.sep):
+                return root
+        return None
+
+    def _scan(self, top):
+        """Record every file under top (recursively)."""
+        pending = [top]
+        while pending:
+            folder = pending.pop()
+            try:
+                entries = list(os.scandir(folder))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            tier = os.path.basename(folder)
+            dpi = tier if tier in DPI_TIERS else ""
+            files = {}
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file():
+                    st = entry.stat()
+                    files[entry.name] = Asset(
+                        Path(entry.path), entry.name, dpi, st.st_size, st.st_mtime_ns
+                    )
+            self._dirs[folder] = files
+
+    def _ensure(self, folder):
+        """Scan the tree holding folder, once per process."""
+        top = self._root_of(folder) or folder
+        if top not in self._scanned:
+            self._scan(top)
+            self._scanned.add(top)
+
+    def refresh(self, *roots):
+        """
+        Rescan trees (default: every tree scanned so far).
+
+        Args:
+            roots: Root directories, or any directory inside one
+        """
+        with self._lock:
+            tops = {self._root_of(os.path.abspath(r)) or os.path.abspath(r) for r in roots}
+            for top in tops or set(self._scanned):
+                for folder in [d for d in self._dirs if d == top or d.startswith(top + os.sep)]:
+                    del self._dirs[folder]
+                self._scan(top)
+                self._scanned.add(top)
+
+    # -- queries -------------------------------------------------------
+
+    def _folder(self, folder):
+        folder = os.path.abspath(folder)
+        with self._lock:
+            self._ensure(folder)
+            return self._dirs.get(folder)
+
+    def has_dir(self, folder):
+        """Whether folder exists (as of the last scan)."""
+        return self._folder(folder) is not None
+
+    def names(self, folder, pattern="*"):
+        """Sorted names of the files directly in folder that match pattern."""
+        files = self._folder(folder) or {}
+        return sorted(n for n in files if fnmatch.fnmatchcase(n, pattern))
+
+    def files(self, folder, pattern="*"):
+        """Paths (folder / name) of the files directly in folder that match pattern."""
+        return [Path(folder) / name for name in self.names(folder, pattern)]
+
+    def get(self, path):
+        """Asset record of a file, or None if it is not cataloged."""
+        files = self._folder(os.path.dirname(os.path.abspath(path))) or {}
+        return files.get(os.path.basename(path))
+
+    def exists(self, path):
+        """Whether a file exists (as of the last scan)."""
+        return self.get(path) is not None
+
+    def find(self, pattern="*", under=None, dpi=None):
+        """
+        Files anywhere below a directory whose name matches pattern.
+
+        Args:
+            pattern: fnmatch pattern for the file name
+            under: Directory to search (default: every root)
+            dpi: Only this DPI tier ("" for 1x, "150", "200")
+
+        Returns:
+            Sorted list of Asset records
+        """
+        tops = [os.path.abspath(under)] if under else self.roots
+        with self._lock:
+            for top in tops:
+                self._ensure(top)
+            found = [
+                asset
+                for folder, files in self._dirs.items()
+                if any(folder == t or folder.startswith(t + os.sep) for t in tops)
+                for name, asset in files.items()
+                if fnmatch.fnmatchcase(name, pattern) and (dpi is None or asset.dpi == dpi)
+            ]
+        return sorted(found, key=lambda a: str(a.path))
+
+    # -- lazily read metadata -------------------------------------------
+
+    def _load(self):
+        if self._meta is not None:
+            return
+        self._meta = {}
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") == CATALOG_VERSION:
+            self._meta = data.get("files", {})
+
+    def _record(self, path):
+        """Persisted record for path, reset if the file changed on disk."""
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = os.path.relpath(path, PROJECT_ROOT).replace(os.sep, "/")
+        with self._lock:
+            self._load()
+            record = self._meta.get(key)
+            if not record or record["size"] != st.st_size or record["mtime_ns"] != st.st_mtime_ns:
+                record = self._meta[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+                self._dirty = True
+            return record
+
+    def digest(self, path):
+        """SHA-256 of a file's content, or None if it does not exist."""
+        record = self._record(path)
+        if record is None:
+            return None
+        if "sha256" not in record:
+            record["sha256"] = _file_sha256(path)
+            self._dirty = True
+        return record["sha256"]
+
+    def image_info(self, path):
+        """
+        (width, height, mode) of a PNG read from its header.
+
+        Returns:
+            None if the file does not exist or is not a PNG
+        """
+        record = self._record(path)
+        if record is None:
+            return None
+        if "image" not in record:
+            record["image"] = read_png_header(path)
+            self._dirty = True
+        return tuple(record["image"]) if record["image"] else None
+
+    def save(self):
+        """
+        Persist hashes and headers if anything new was read. On a
+        read-only checkout they are simply re-read next time.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                with open(tmp, 'w') as f:
+                    json.dump({"version": CATALOG_VERSION, "files": self._meta}, f,
+                              separators=(",", ":"), sort_keys=True)
+                os.replace(tmp, self.path)
+            except OSError:
+                return
+            self._dirty = False
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def catalog():
+    """The catalog shared by every stage running in this process."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = AssetCatalog()
+        return _shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asset catalog")
+    parser.add_argument("pattern", nargs="?", help="List files whose name matches a pattern")
+    parser.add_argument("--dpi", help="Only this DPI tier ('' for 1x, 150, 200)")
+    args = parser.parse_args()
+
+    cat = catalog()
+    if args.pattern:
+        for asset in cat.find(args.pattern, dpi=args.dpi):
+            info = cat.image_info(asset.path)
+            size = f"{info[0]}x{info[1]} {info[2]}" if info else "-"
+            print(f"  {os.path.relpath(asset.path, PROJECT_ROOT)}  {size}")
+    else:
+        for root in cat.roots:
+            assets = cat.find(under=root)
+            print(f"  {os.path.relpath(root, PROJECT_ROOT)}: {len(assets)} files")
+    cat.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the build, with a stored baseline to compare against.
+
+Three kinds of benchmark:
+
+    micro   hot functions: shift_green_to_blue, sprite sheet composition,
+            hex_to_reaper, the .ReaperTheme color pass and the rtconfig pass
+    stage   each pipeline stage on its own, with the output cache off
+    e2e     build_all.py --stream against the checked-in theme_source,
+            cold (--no-cache) and warm
+
+Stages run against an image store backed by theme_source (as with
+build_all.py --stream), so nothing is written to build/ and nothing is
+deployed. Each benchmark is timed `repeat` times and its median, min and
+max per call are reported in milliseconds.
+
+Results are written as JSON to .build_cache/benchmarks/latest.json (or
+--output). Baselines are per machine and are not checked in:
+--save-baseline stores the results as .build_cache/benchmarks/baseline.json,
+and --compare fails (exit 1) when a benchmark's median is more than
+--threshold percent slower than the baseline.
+
+Usage:
+    python scripts/benchmark.py                        # everything
+    python scripts/benchmark.py --kind micro           # micro-benchmarks only
+    python scripts/benchmark.py --save-baseline
+    python scripts/benchmark.py --compare --threshold 15
+    python scripts/benchmark.py --compare --results other.json
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+BENCH_DIR = PROJECT_ROOT / ".build_cache" / "benchmarks"
+LATEST_FILE = BENCH_DIR / "latest.json"
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+
+# Bump when benchmark definitions change meaningfully; --compare refuses
+# to compare results of different versions
+SUITE_VERSION = 1
+
+# Default regression threshold for --compare, in percent
+DEFAULT_THRESHOLD = 10.0
+
+KINDS = ("micro", "stage", "e2e")
+
+
+@dataclass
+class Benchmark:
+    """
+    A named timing: setup(scratch) returns the callable to time. scratch
+    is a temporary directory, removed once the benchmark is measured.
+    """
+    name: str
+    kind: str
+    setup: object
+    number: int = 1   # calls per timing
+    repeat: int = 5   # timings
+
+
+@contextlib.contextmanager
+def _quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def _stream_store():
+    """Image store over theme_source, active for the block (nothing touches build/)."""
+    import build_theme
+    from image_store import ImageStore, use_store
+
+    store = ImageStore(sources=build_theme.stream_sources())
+    use_store(store)
+    try:
+        yield store
+    finally:
+        use_store(None)
+
+
+def _in_stream_store(func):
+    """func run inside a fresh stream store, with its output suppressed."""
+    def run():
+        with _stream_store(), _quiet():
+            func()
+    return run
+
+
+# -- micro -------------------------------------------------------------
+
+def _setup_shift_green_to_blue(scratch):
+    from recolor_green_to_blue import shift_green_to_blue
+
+    # A 64x64 sweep over the RGB cube, with a few transparent pixels
+    pixels = [
+        ((i * 37) % 256, (i * 91) % 256, (i * 53) % 256, 255 if i % 17 else 0)
+        for i in range(64 * 64)
+    ]
+
+    def run():
+        for pixel in pixels:
+            shift_green_to_blue(*pixel)
+    return run
+
+
+def _setup_sprite_sheet(scratch):
+    import create_transport_sprites as transport
+    from sprite_engine import SpriteEngine
+
+    source = transport.ASSETS_DIR / "play_off.png"
+    size = (transport.FRAME_WIDTH, transport.FRAME_HEIGHT)
+    SpriteEngine().source(source)  # warm the decode cache
+
+    def run():
+        engine = SpriteEngine()
+        frame_key, _ = engine.fitted_frame(source, size)
+        engine.sheet(frame_key, (1.0, 1.15, 0.85))
+    return run
+
+
+def _setup_hex_to_reaper(scratch):
+    from apply_colors import PALETTE
+    from reaper_theme import hex_to_reaper
+
+    colors = list(PALETTE.values())
+
+    def run():
+        for color in colors:
+            hex_to_reaper(color)
+    return run
+
+
+def _setup_theme_colors(scratch):
+    import build_theme
+    from apply_colors import COLOR_MAPPINGS, PALETTE
+    from reaper_theme import COLOR_SECTION, ReaperTheme, hex_to_reaper
+
+    text = build_theme.SOURCE_THEME.read_bytes().decode()
+    values = {key: hex_to_reaper(PALETTE[name]) for key, name in COLOR_MAPPINGS.items()}
+
+    def run():
+        theme = ReaperTheme(text)
+        theme.update(COLOR_SECTION, values)
+        theme.serialize()
+    return run
+
+
+def _setup_rtconfig(scratch):
+    from update_rtconfig import RTCONFIG_PATH, update_rtconfig
+
+    with _stream_store() as store:
+        data = store.read_bytes(RTCONFIG_PATH)
+
+    def run():
+        # Start from the source text held in memory: no file I/O is timed
+        with _stream_store() as store, _quiet():
+            store.put_bytes(RTCONFIG_PATH, data)
+            update_rtconfig()
+    return run
+
+
+# -- stages ------------------------------------------------------------
+
+def _setup_stage_transport(scratch):
+    import create_transport_sprites as transport
+    from build_cache import BuildCache
+
+    cache_root = scratch / "cache"
+
+    def stage():
+        cache = BuildCache("transport_sprites", "bench", enabled=False, root=cache_root)
+        transport.ENGINE.clear()
+        transport.process_transport_sprites(cache=cache)
+    return _in_stream_store(stage)
+
+
+def _setup_stage_fx(scratch):
+    from create_fx_sprites import copy_fx_files
+    return _in_stream_store(copy_fx_files)
+
+
+def _setup_stage_apply_colors(scratch):
+    from apply_colors import apply_colors
+    return _in_stream_store(apply_colors)
+
+
+def _setup_stage_update_rtconfig(scratch):
+    from update_rtconfig import update_rtconfig
+    return _in_stream_store(update_rtconfig)
+
+
+def _setup_stage_package(scratch):
+    import build_theme
+    from apply_colors import apply_colors
+    from create_fx_sprites import copy_fx_files
+    from create_transport_sprites import process_transport_sprites
+    from update_rtconfig import update_rtconfig
+
+    output = scratch / "theme.ReaperThemeZip"
+    with _stream_store() as store, _quiet():
+        for stage in (update_rtconfig, apply_colors, process_transport_sprites, copy_fx_files):
+            stage()
+        # Encode once up front; packaging is what is timed
+        for name in store.dirty_names():
+            store.read_bytes(name)
+
+    def run():
+        from image_store import use_store
+
+        use_store(store)
+        try:
+            with _quiet():
+                build_theme.create_zip(full=True, stream=True, output=output)
+        finally:
+            use_store(None)
+    return run
+
+
+# -- end to end --------------------------------------------------------
+
+def _setup_build_all(*flags):
+    def setup(scratch):
+        output = scratch / "theme.ReaperThemeZip"
+        command = [
+            sys.executable, str(PROJECT_ROOT / "scripts" / "build_all.py"),
+            "--stream", "--no-deploy", "--output", str(output), *flags,
+        ]
+
+        def run():
+            try:
+                subprocess.run(command, check=True, cwd=PROJECT_ROOT,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            except subprocess.CalledProcessError as e:
+                sys.stderr.write(e.stderr.decode(errors="replace"))
+                raise
+        return run
+    return setup
+
+
+BENCHMARKS = [
+    Benchmark("shift_green_to_blue", "micro", _setup_shift_green_to_blue, number=5),
+    Benchmark("sprite_sheet", "micro", _setup_sprite_sheet, number=20),
+    Benchmark("hex_to_reaper", "micro", _setup_hex_to_reaper, number=1000),
+    Benchmark("apply_colors_pass", "micro", _setup_theme_colors, number=20),
+    Benchmark("update_rtconfig_pass", "micro", _setup_rtconfig, number=10),
+    Benchmark("stage:update_rtconfig", "stage", _setup_stage_update_rtconfig),
+    Benchmark("stage:apply_colors", "stage", _setup_stage_apply_colors),
+    Benchmark("stage:transport_sprites", "stage", _setup_stage_transport),
+    Benchmark("stage:fx_sprites", "stage", _setup_stage_fx),
+    Benchmark("stage:package", "stage", _setup_stage_package),
+    Benchmark("build_all:cold", "e2e", _setup_build_all("--no-cache"), repeat=3),
+    Benchmark("build_all:warm", "e2e", _setup_build_all(), repeat=3),
+]
+
+
+def measure(benchmark, repeat=None):
+    """
+    Time one benchmark.
+
+    Returns:
+        Dict with median/min/max milliseconds per call and the run counts
+    """
+    repeat = repeat or benchmark.repeat
+    timings = []
+    with tempfile.TemporaryDirectory(prefix="bench-") as scratch:
+        func = benchmark.setup(Path(scratch))
+        func()  # warm-up: imports, caches, lazily built tables
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(benchmark.number):
+                func()
+            timings.append((time.perf_counter() - start) / benchmark.number * 1000)
+    return {
+        "kind": benchmark.kind,
+        "median_ms": round(statistics.median(timings), 4),
+        "min_ms": round(min(timings), 4),
+        "max_ms": round(max(timings), 4),
+        "number": benchmark.number,
+        "repeat": repeat,
+    }
+
+
+def machine_info():
+    """Environment the results were measured in."""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+    for module in ("PIL", "numpy"):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            pass
+    return info
+
+
+def run_benchmarks(kinds=KINDS, pattern="*", repeat=None):
+    """Run the selected benchmarks, printing each result as it completes."""
+    results = {}
+    for benchmark in BENCHMARKS:
+        if benchmark.kind not in kinds or not fnmatch.fnmatchcase(benchmark.name, pattern):
+            continue
+        result = results[benchmark.name] = measure(benchmark, repeat)
+        print(f"  {benchmark.name:<26} {result['median_ms']:>10.3f} ms  "
+              f"(min {result['min_ms']:.3f}, max {result['max_ms']:.3f})")
+    return {
+        "version": SUITE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": machine_info(),
+        "results": results,
+    }
+
+
+def write_results(data, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+
+
+def load_results(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare medians against a baseline.
+
+    Returns:
+        List of (name, baseline ms, current ms, change %) slower than threshold
+    """
+    if current.get("version") != baseline.get("version"):
+        raise ValueError(
+            f"Suite version {current.get('version')} cannot be compared with "
+            f"baseline version {baseline.get('version')}; save a new baseline"
+        )
+
+    regressions = []
+    print(f"  {'benchmark':<26} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"  {name:<26} {'-':>10} {result['median_ms']:>10.3f}      new")
+            continue
+        change = (result["median_ms"] - base["median_ms"]) / base["median_ms"] * 100
+        mark = "✗" if change > threshold else " "
+        print(f"{mark} {name:<26} {base['median_ms']:>10.3f} {result['median_ms']:>10.3f} "
+              f"{change:>+7.1f}%")
+        if change > threshold:
+            regressions.append((name, base["median_ms"], result["median_ms"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build benchmarks")
+    parser.add_argument("--kind", choices=KINDS, action="append",
+                        help="Only run benchmarks of this kind (repeatable)")
+    parser.add_argument("--filter", default="*", metavar="PATTERN",
+                        help="Only run benchmarks whose name matches a glob pattern")
+    parser.add_argument("--repeat", type=int, default=None,
+                        help="Timings per benchmark (default: per benchmark)")
+    parser.add_argument("--output", type=Path, default=LATEST_FILE,
+                        help=f"Results file (default: {LATEST_FILE.relative_to(PROJECT_ROOT)})")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Also store the results as the baseline")
+    parser.add_argument("--compare", action="store_true",
+                        help="Compare with the baseline; exit 1 on regressions")
+    parser.add_argument("--results", type=Path, default=None,
+                        help="With --compare, compare this results file instead of running")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE,
+                        help=f"Baseline file (default: {BASELINE_FILE.relative_to(PROJECT_ROOT)})")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed slowdown in percent (default: {DEFAULT_THRESHOLD:g})")
+    args = parser.parse_args()
+
+    if args.results:
+        current = load_results(args.results)
+    else:
+        print("Running benchmarks...")
+        current = run_benchmarks(tuple(args.kind or KINDS), args.filter, args.repeat)
+        write_results(current, args.output)
+        print(f"✓ Results: {args.output}")
+        if args.save_baseline:
+            write_results(current, args.baseline)
+            print(f"✓ Baseline: {args.baseline}")
+
+    if not args.compare:
+        return
+    try:
+        baseline = load_results(args.baseline)
+    except FileNotFoundError:
+        print(f"✗ No baseline at {args.baseline} (run with --save-baseline first)")
+        sys.exit(1)
+
+    print(f"\nComparing with {args.baseline} (threshold {args.threshold:g}%)")
+    try:
+        regressions = compare(current, baseline, args.threshold)
+    except ValueError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    if regressions:
+        print(f"✗ {len(regressions)} benchmarks regressed")
+        sys.exit(1)
+    print("✓ No regressions")
+
+
+if __name__ == "__main__":
+    main()
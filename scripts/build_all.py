@@ -1,18 +1,50 @@
 #!/usr/bin/env python3
 """
 Master build script for Default 7.0 DarkMinimal theme.
-Runs all build steps in the correct order.
-Can be run locally or in CI.
+Runs all build steps in-process, independent steps concurrently
+(see pipeline.py). Can be run locally or in CI.
+
+With --watch it then keeps running: changed sources are mapped to the
+stages that read them, and only those stages, packaging and deployment
+are re-run (see watch.py).
+
+With --trace every stage and output group is recorded as a span and the
+build writes a Chrome trace plus a per-stage summary; --cprofile also
+profiles each stage (see tracing.py).
 """
 
-import subprocess
+import argparse
+import importlib
+import os
 import sys
-import shutil
+import time
 from pathlib import Path
 
+from build_profile import add_profile_argument, current_profile, use_profile
+
 PROJECT_ROOT = Path(__file__).parent.parent
 THEME_SOURCE = PROJECT_ROOT / "theme_source"
 BUILD_DIR = PROJECT_ROOT / "build"
+SCRIPTS_DIR = PROJECT_ROOT / "scripts"
+TRACE_FILE = PROJECT_ROOT / ".build_cache" / "trace" / "build.trace.json"
+
+# What --watch follows
+WATCH_PATHS = [
+    PROJECT_ROOT / "assets",
+    THEME_SOURCE,
+    PROJECT_ROOT / "fx_mappings.json",
+    SCRIPTS_DIR,
+]
+
+# Stage scripts --watch reloads in place when edited, with the stage they
+# define; edits to any other script restart the build
+STAGE_MODULES = {
+    "update_rtconfig": "update_rtconfig",
+    "apply_colors": "apply_colors",
+    "create_transport_sprites": "transport_sprites",
+    "create_fx_sprites": "fx_sprites",
+    "build_theme": "build_theme",
+}
 
 
 def check_dependencies():
@@ -28,13 +60,15 @@ def check_dependencies():
 
 def check_assets():
     """Verify required assets exist."""
+    from asset_catalog import catalog
+
     required_assets = [
         PROJECT_ROOT / "assets" / "transport" / "play_off.png",
         PROJECT_ROOT / "assets" / "transport" / "play_on.png",
         # FX assets are now sourced from LCS theme (no custom assets needed)
     ]
     
-    missing = [a for a in required_assets if not a.exists()]
+    missing = [a for a in required_assets if not catalog().exists(a)]
     if missing:
         print(f"  ✗ Missing assets:")
         for a in missing:
@@ -45,14 +79,22 @@ def check_assets():
     return True
 
 
-def setup_build_directory():
-    """Setup build directory from base theme."""
+def setup_build_directory(link_mode="auto"):
+    """
+    Sync the build directory with the base theme.
+
+    Files are reflinked or hard-linked from theme_source where the
+    filesystem allows it (see build_fs.py); only files that changed
+    since the last sync are re-created.
+    """
+    from asset_catalog import catalog
+    from build_fs import TreeLinker, sync_file, sync_tree
 
     # The unpacked theme folder should be checked into the repo
     theme_folder = THEME_SOURCE / "Default_7.0_unpacked"
     theme_file = THEME_SOURCE / "Default_7.0_unpacked.ReaperTheme"
 
-    if not theme_folder.exists():
+    if not catalog().has_dir(theme_folder):
         print(f"  ✗ Base theme folder not found: {theme_folder}")
         print("    The Default 7.0 theme source files should be in the theme_source directory.")
         return False
@@ -61,40 +103,354 @@ def setup_build_directory():
     build_unpacked = BUILD_DIR / "Default_7.0_DarkMinimal_unpacked"
     build_theme = BUILD_DIR / "Default_7.0_DarkMinimal_unpacked.ReaperTheme"
 
-    if not build_unpacked.exists():
-        print("  Copying base theme to build directory...")
-        BUILD_DIR.mkdir(parents=True, exist_ok=True)
-        shutil.copytree(theme_folder, build_unpacked)
-        shutil.copy2(theme_file, build_theme)
+    BUILD_DIR.mkdir(parents=True, exist_ok=True)
+    linker = TreeLinker(link_mode)
+    stats = sync_tree(theme_folder, build_unpacked, linker)
+    if sync_file(theme_file, build_theme, linker):
+        stats["placed"] += 1
+    catalog().refresh(BUILD_DIR)
 
-    print("  ✓ Build directory ready")
+    methods = ", ".join(f"{n} {m}" for m, n in linker.counts.items() if n)
+    print(
+        f"  ✓ Build directory ready ({stats['placed']} synced"
+        f"{f' via {methods}' if methods else ''}, {stats['unchanged']} unchanged, "
+        f"{stats['removed']} removed)"
+    )
     return True
 
 
-def run_script(script_name, description):
-    """Run a Python script and check for errors."""
-    script_path = PROJECT_ROOT / script_name
-    
-    if not script_path.exists():
-        print(f"  ⚠ Skipping {script_name} (not found)")
-        return True
-    
-    print(f"\n{'─' * 50}")
-    print(f"▶ {description}")
-    print(f"{'─' * 50}")
-    
-    result = subprocess.run([sys.executable, str(script_path)], cwd=PROJECT_ROOT)
-    
-    if result.returncode != 0:
-        print(f"  ✗ {script_name} failed!")
-        return False
-    
-    return True
+def build_stages(full_package=False, pyramid=False, stream=False, output=None, deploy=True):
+    """
+    Declare the build steps with the paths they read and write.
+
+    Steps touching disjoint files run concurrently; packaging reads the
+    whole build directory, so it waits for everything else.
+    """
+    import apply_colors
+    import build_theme
+    import create_fx_sprites
+    import create_transport_sprites
+    import update_rtconfig
+    from pipeline import Stage
+
+    unpacked = BUILD_DIR / "Default_7.0_DarkMinimal_unpacked"
+    output = output or build_theme.OUTPUT_ZIP
+
+    transport_outputs = [
+        unpacked / tier / name
+        for names in create_transport_sprites.TRANSPORT_MAPPINGS.values()
+        for name in names if name
+        for tier, _ in create_transport_sprites.DPI_SCALES
+    ]
+    fx_outputs = [
+        unpacked / tier / name
+        for name in create_fx_sprites.FX_FILES
+        for tier in ["", "150", "200"]
+    ]
+
+    return [
+        Stage(
+            "update_rtconfig", update_rtconfig.update_rtconfig,
+            "Updating rtconfig.txt transport settings",
+            inputs=[update_rtconfig.RTCONFIG_PATH],
+            outputs=[update_rtconfig.RTCONFIG_PATH],
+        ),
+        Stage(
+            "apply_colors", apply_colors.apply_colors,
+            "Applying color palette",
+            inputs=[apply_colors.THEME_PATH],
+            outputs=[apply_colors.THEME_PATH],
+        ),
+        Stage(
+            "transport_sprites",
+            lambda: create_transport_sprites.process_transport_sprites(pyramid=pyramid),
+            "Creating transport icon sprites",
+            inputs=[create_transport_sprites.ASSETS_DIR],
+            outputs=transport_outputs,
+        ),
+        Stage(
+            "fx_sprites", create_fx_sprites.copy_fx_files,
+            "Creating FX button sprites",
+            inputs=[create_fx_sprites.LCS_DIR, PROJECT_ROOT / "fx_mappings.json"],
+            outputs=fx_outputs,
+        ),
+        Stage(
+            "build_theme",
+            lambda: build_theme.build(full=full_package, stream=stream, output=output,
+                                      deploy_zip=deploy),
+            "Building and deploying theme",
+            inputs=[BUILD_DIR],
+            outputs=[output],
+        ),
+    ]
+
+
+def run_build(stages, store=None, stream=False, trace=None, cprofile=False):
+    """
+    Run build stages with an optional image store.
+
+    Args:
+        trace: Where to write a Chrome trace of the run (None: no tracing)
+        cprofile: Also profile each stage, saving reports next to the trace;
+            stages then run one at a time so the profiles do not overlap
+
+    Returns:
+        True if every stage succeeded
+    """
+    import tracing
+    from asset_catalog import catalog
+    from image_store import use_store
+    from pipeline import print_timings, run_stages
+
+    tracer = None
+    if trace is not None:
+        tracer = tracing.start_tracing(Path(trace).parent if cprofile else None)
+
+    use_store(store)
+    ok, durations = run_stages(stages, max_workers=1 if cprofile else None)
+    print_timings(durations)
+    if store is not None:
+        written = 0 if stream else store.flush()
+        print(f"\n  ✓ Image store: {store.encodes} encoded, {written} written to build/, "
+              f"{store.spilled} spilled")
+    use_store(None)
+    catalog().save()
+
+    if tracer is not None:
+        tracing.stop_tracing()
+        tracer.print_summary()
+        tracer.write(trace)
+        print(f"\n  ✓ Trace: {os.path.relpath(trace, PROJECT_ROOT)}"
+              + (" (stage profiles alongside)" if cprofile else ""))
+    return ok
+
+
+def _build_path(source):
+    """build/ path a theme_source file is synced to, or None."""
+    import build_theme
+
+    for name, root in build_theme.stream_sources().items():
+        if source == root:
+            return BUILD_DIR / name
+        if root in source.parents:
+            return BUILD_DIR / name / source.relative_to(root)
+    return None
+
+
+def _source_path(target):
+    """theme_source file a build/ path is synced from, or None."""
+    import build_theme
+
+    for name, root in build_theme.stream_sources().items():
+        top = BUILD_DIR / name
+        if target == top:
+            return root
+        if top in target.parents:
+            return root / target.relative_to(top)
+    return None
+
+
+def plan_rebuild(changed, stages):
+    """
+    Map changed files to the work --watch has to redo.
+
+    Returns:
+        (names of the stages to re-run, [(theme_source file, build path)]
+        to re-sync, stage modules to reload, whether to restart)
+    """
+    from pipeline import paths_overlap
+
+    names, synced, reload, restart = set(), [], set(), False
+    for path in map(Path, changed):
+        if path.parent == SCRIPTS_DIR:
+            if path.suffix != ".py":
+                continue
+            if path.stem in STAGE_MODULES:
+                reload.add(path.stem)
+                names.add(STAGE_MODULES[path.stem])
+            else:
+                restart = True
+            continue
+
+        target = _build_path(path)
+        if target is not None:
+            synced.append((path, target))
+            path = target
+        for stage in stages:
+            if any(paths_overlap(str(path), p) for p in stage.inputs + stage.outputs):
+                names.add(stage.name)
+
+    if names:
+        # Every rebuild ends with packaging and deployment
+        names.add("build_theme")
+    return names, synced, reload, restart
+
+
+def rebuild(changed, args, output, store, linker):
+    """
+    Re-run the stages affected by changed files.
+
+    Returns:
+        True/False for the stages' success, None if nothing was affected
+    """
+    from asset_catalog import catalog
+    from build_fs import prepare_write, sync_file
+    from sprite_engine import ENGINE
+
+    def stages():
+        return build_stages(full_package=args.no_cache, pyramid=args.pyramid,
+                            stream=args.stream, output=output, deploy=not args.no_deploy)
+
+    names, synced, reload, restart = plan_rebuild(changed, stages())
+    if restart:
+        print("  ↻ Build scripts changed, restarting...")
+        sys.stdout.flush()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+    if not names:
+        print("  No stage reads these files")
+        return None
+
+    for module in sorted(reload):
+        importlib.reload(importlib.import_module(module))
+    selected = [stage for stage in stages() if stage.name in names]
+    catalog().refresh()
+
+    # Changed theme files replace their build copies (stream builds read
+    # theme_source directly), and in-place stages start over from the source
+    restore = list(synced)
+    for stage in selected:
+        for out in set(stage.outputs) & set(stage.inputs):
+            source = _source_path(Path(out))
+            if source is not None:
+                restore.append((source, Path(out)))
+    for source, target in restore:
+        if store is not None:
+            store.discard(target)
+        if args.stream:
+            continue
+        if source.is_file():
+            sync_file(source, target, linker)
+        elif target.is_file():
+            prepare_write(target)
+            target.unlink()
+    if not args.stream:
+        catalog().refresh(BUILD_DIR)
+    ENGINE.forget_sources()
+
+    print(f"  ↻ Re-running: {', '.join(stage.name for stage in selected)}")
+    return run_build(selected, store, args.stream, args.trace, args.cprofile)
+
+
+def watch(args, output, store):
+    """Rebuild, repackage and redeploy whenever watched files change."""
+    from build_fs import TreeLinker
+    from watch import open_watcher
+
+    watcher = open_watcher(WATCH_PATHS, poll=args.poll)
+    linker = TreeLinker(args.link_mode)
+    watched = ", ".join(os.path.relpath(p, PROJECT_ROOT) for p in WATCH_PATHS)
+    print(f"\n👀 Watching {watched} ({watcher.kind}); Ctrl+C to stop")
+    try:
+        while True:
+            changed = watcher.wait()
+            start = time.perf_counter()
+            shown = sorted(os.path.relpath(p, PROJECT_ROOT) for p in changed)
+            more = f" (+{len(shown) - 5} more)" if len(shown) > 5 else ""
+            print(f"\n{'=' * 50}\n✎ Changed: {', '.join(shown[:5])}{more}")
+            ok = rebuild(changed, args, output, store, linker)
+            if ok is not None:
+                status = "✓ Rebuilt" if ok else "✗ Rebuild failed"
+                print(f"{status} in {(time.perf_counter() - start) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        watcher.close()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Build the DarkMinimal theme")
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=None,
+        help="Worker processes for image stages (default: CPU count; 1 = serial)",
+    )
+    parser.add_argument(
+        "--memory-budget", type=int, default=None, metavar="MB",
+        help="Max decoded image MB in flight per image stage",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Regenerate every asset and recompress the whole zip",
+    )
+    parser.add_argument(
+        "--explain", action="store_true",
+        help="Report why each cached asset was rebuilt",
+    )
+    parser.add_argument(
+        "--pyramid", action="store_true",
+        help="Render transport sprites at 2x and downsample the smaller DPI tiers",
+    )
+    parser.add_argument(
+        "--image-store", action="store_true",
+        help="Keep generated images in memory and encode them once, at packaging time",
+    )
+    add_profile_argument(parser)
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Package straight from memory and the source theme; build/ is not created "
+             "(implies --image-store)",
+    )
+    parser.add_argument(
+        "--output", type=Path, default=None, metavar="ZIP",
+        help="Where to write the .ReaperThemeZip (default: project root)",
+    )
+    parser.add_argument(
+        "--no-deploy", action="store_true",
+        help="Build the zip without copying it to the deploy_config.py targets",
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="After building, rebuild and redeploy whatever changed sources affect",
+    )
+    parser.add_argument(
+        "--poll", action="store_true",
+        help="With --watch, poll for changes instead of using inotify",
+    )
+    parser.add_argument(
+        "--trace", nargs="?", type=Path, const=TRACE_FILE, default=None, metavar="JSON",
+        help="Record a span per stage and output group; write a Chrome trace "
+             f"(default: {TRACE_FILE.relative_to(PROJECT_ROOT)}) and print a summary",
+    )
+    parser.add_argument(
+        "--cprofile", action="store_true",
+        help="Run stages one at a time under cProfile and tracemalloc, saving "
+             "<stage>.prof / <stage>.txt next to the trace (implies --trace)",
+    )
+    parser.add_argument(
+        "--link-mode", choices=["auto", "reflink", "hardlink", "copy"], default="auto",
+        help="How to populate build/ from theme_source (default: best available)",
+    )
+    args = parser.parse_args()
+    if args.cprofile and args.trace is None:
+        args.trace = TRACE_FILE
+
+    # Image stages read these (see scripts/parallel.py)
+    if args.jobs:
+        os.environ["BUILD_JOBS"] = str(args.jobs)
+    if args.memory_budget:
+        os.environ["BUILD_MEMORY_BUDGET_MB"] = str(args.memory_budget)
+
+    # Every stage encodes through this (see scripts/build_profile.py)
+    if args.profile:
+        use_profile(args.profile)
+
+    # Cached stages read these (see scripts/build_cache.py)
+    if args.no_cache:
+        os.environ["BUILD_NO_CACHE"] = "1"
+    if args.explain:
+        os.environ["BUILD_CACHE_EXPLAIN"] = "1"
+
     print("=" * 50)
-    print("🎨 Default 7.0 DarkMinimal Theme - Full Build")
+    print(f"🎨 Default 7.0 DarkMinimal Theme - Full Build ({current_profile().name} profile)")
     print("=" * 50)
     
     # Pre-flight checks
@@ -106,27 +462,39 @@ def main():
     if not check_assets():
         sys.exit(1)
     
-    print("\n[3/3] Setting up build directory...")
-    if not setup_build_directory():
-        sys.exit(1)
-    
     # Build steps
-    steps = [
-        ("scripts/update_rtconfig.py", "Updating rtconfig.txt transport settings"),
-        ("scripts/apply_colors.py", "Applying color palette"),
-        ("scripts/create_transport_sprites.py", "Creating transport icon sprites"),
-        ("scripts/create_fx_sprites.py", "Creating FX button sprites"),
-        ("scripts/build_theme.py", "Building and deploying theme"),
-    ]
-    
-    for script, desc in steps:
-        if not run_script(script, desc):
-            print("\n✗ Build failed!")
+    import build_theme
+    from asset_catalog import catalog
+    from image_store import ImageStore
+
+    if args.stream:
+        print("\n[3/3] Streaming from theme source...")
+        if not catalog().has_dir(build_theme.SOURCE_DIR):
+            print(f"  ✗ Base theme folder not found: {build_theme.SOURCE_DIR}")
+            sys.exit(1)
+        print("  ✓ build/ will not be written")
+        store = ImageStore(sources=build_theme.stream_sources())
+    else:
+        print("\n[3/3] Setting up build directory...")
+        if not setup_build_directory(args.link_mode):
             sys.exit(1)
+        store = ImageStore() if args.image_store else None
+
+    output = args.output or build_theme.OUTPUT_ZIP
+    ok = run_build(build_stages(
+        full_package=args.no_cache, pyramid=args.pyramid, stream=args.stream, output=output,
+        deploy=not args.no_deploy,
+    ), store, args.stream, args.trace, args.cprofile)
+    if args.watch:
+        watch(args, output, store)
+        return
+    if not ok:
+        print("\n✗ Build failed!")
+        sys.exit(1)
     
     print("\n" + "=" * 50)
     print("✓ Build complete!")
-    print(f"  Output: {PROJECT_ROOT / 'Default_7.0_DarkMinimal.ReaperThemeZip'}")
+    print(f"  Output: {output}")
     print("=" * 50)
 
 
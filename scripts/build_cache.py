@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for generated build assets.
+
+Every cached output group (a sprite at all DPI tiers, a recolored icon,
+...) is keyed by a hash of its inputs: the bytes of its source files, the
+stage parameters that shape it (FRAME_SIZE, brightness factors, hue
+windows, ...) and the code version of the scripts that produce it. On a
+hit the cached bytes are copied to the build tree instead of recomputing
+them; destinations that already hold identical bytes are left alone.
+
+Entries live under .build_cache/outputs/<digest>/ with a meta.json whose
+mtime doubles as the LRU clock. Eviction removes the least recently used
+entries once the total size passes BUILD_CACHE_MAX_MB.
+
+For every output group the last key components are kept per stage, so a
+miss can be explained ("source play_off.png changed", "param FRAME_SIZE
+changed", "code changed", ...).
+
+Stages expose --no-cache and --explain; build_all.py forwards them
+through BUILD_NO_CACHE and BUILD_CACHE_EXPLAIN.
+
+When an image store is active (image_store.py), outputs are restored
+into it and stored from it rather than through files in build/.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from functools import partial
+from pathlib import Path
+
+from build_fs import prepare_write
+from build_profile import DEFAULT_PROFILE, current_profile
+from image_store import active_store
+import tracing
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CACHE_ROOT = PROJECT_ROOT / ".build_cache"
+
+# Default total size cap for cached outputs
+DEFAULT_MAX_SIZE_MB = 256
+
+
+def file_digest(path):
+    """SHA-256 of a file's bytes, or 'missing'."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return "missing"
+
+
+def code_version(*paths):
+    """Hash the given source files plus the imaging library versions."""
+    h = hashlib.sha256()
+    for path in sorted(str(p) for p in paths):
+        h.update(Path(path).name.encode())
+        h.update(Path(path).read_bytes())
+
+    try:
+        import PIL
+        h.update(PIL.__version__.encode())
+    except ImportError:
+        pass
+    try:
+        import numpy
+        h.update(numpy.__version__.encode())
+    except ImportError:
+        pass
+    return h.hexdigest()[:16]
+
+
+def _read_output(path):
+    """Current bytes of an output, preferring a newer copy in the image store."""
+    store = active_store()
+    try:
+        if store is not None and (store.is_dirty(Path(path)) or store.sources) and store.covers(path):
+            return store.read_bytes(Path(path))
+        return Path(path).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def _display(path):
+    """Project-relative path for keys and reports."""
+    path = Path(path)
+    try:
+        return str(path.relative_to(PROJECT_ROOT))
+    except ValueError:
+        return str(path)
+
+
+def add_cache_arguments(parser):
+    """Add --no-cache and --explain options to an argparse parser."""
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Recompute every output instead of using .build_cache",
+    )
+    parser.add_argument(
+        "--explain", action="store_true",
+        help="Report why each output was rebuilt",
+    )
+
+
+def cache_enabled(args=None):
+    """Cache switch from parsed args or BUILD_NO_CACHE."""
+    if args is not None and getattr(args, "no_cache", False):
+        return False
+    return os.environ.get("BUILD_NO_CACHE") != "1"
+
+
+def explain_enabled(args=None):
+    """Explain switch from parsed args or BUILD_CACHE_EXPLAIN."""
+    if args is not None and getattr(args, "explain", False):
+        return True
+    return os.environ.get("BUILD_CACHE_EXPLAIN") == "1"
+
+
+class BuildCache:
+    """Output cache for one build stage."""
+
+    def __init__(self, stage, code, enabled=True, explain=False, max_bytes=None, root=None):
+        """
+        Args:
+            stage: Stage name, used to group explain records
+            code: Code version string (see code_version())
+            enabled: False to always recompute (--no-cache)
+            explain: Print why each output was rebuilt in finish()
+            max_bytes: Total cache size cap (default: BUILD_CACHE_MAX_MB)
+            root: Cache directory (default: .build_cache)
+        """
+        root = Path(root or CACHE_ROOT)
+        self.stage = stage
+        self.code = code
+        self.enabled = enabled
+        self.explain = explain
+        self.objects = root / "outputs"
+        self.explain_file = root / "explain" / f"{stage}.json"
+        if max_bytes is None:
+            mb = int(os.environ.get("BUILD_CACHE_MAX_MB", DEFAULT_MAX_SIZE_MB))
+            max_bytes = mb * 1024 * 1024
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = []  # (output_id, reasons)
+        self._previous = self._load_explain()
+        self._current = {}
+
+    @classmethod
+    def for_stage(cls, stage, code_files, args=None):
+        """Create a stage cache configured from parsed args and the environment."""
+        return cls(
+            stage, code_version(*code_files),
+            enabled=cache_enabled(args), explain=explain_enabled(args),
+        )
+
+    def _load_explain(self):
+        try:
+            with open(self.explain_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def key(self, sources=(), params=None):
+        """
+        Build a cache key from source files and parameters.
+
+        Returns:
+            (digest, components) where components maps "source:<path>",
+            "param:<name>", "code" and (for non-default encoding profiles)
+            "profile" to their fingerprints
+        """
+        components = {"code": self.code}
+        profile = current_profile().name
+        if profile != DEFAULT_PROFILE:
+            components["profile"] = profile
+        for path in sources:
+            components[f"source:{_display(path)}"] = file_digest(path)
+        for name, value in (params or {}).items():
+            components[f"param:{name}"] = json.dumps(value, sort_keys=True, default=str)
+
+        blob = json.dumps([self.stage, components], sort_keys=True)
+        return hashlib.sha256(blob.encode()).hexdigest(), components
+
+    def _reasons(self, output_id, components):
+        """Explain a miss by diffing against the last recorded key."""
+        if not self.enabled:
+            return ["cache disabled"]
+
+        previous = self._previous.get(output_id)
+        if previous is None:
+            return ["new output"]
+
+        reasons = []
+        for name in sorted(set(previous) | set(components)):
+            if previous.get(name) == components.get(name):
+                continue
+            if name == "code":
+                reasons.append("code changed")
+            elif name not in previous:
+                reasons.append(f"{name.replace(':', ' ', 1)} added")
+            elif name not in components:
+                reasons.append(f"{name.replace(':', ' ', 1)} removed")
+            else:
+                reasons.append(f"{name.replace(':', ' ', 1)} changed")
+        return reasons or ["cache entry missing (evicted or never stored)"]
+
+    def fetch(self, output_id, key, outputs):
+        """
+        Restore an output group from the cache.
+
+        Args:
+            output_id: Stable name of the output group (for explain)
+            key: (digest, components) from key()
+            outputs: Destination paths of the group, in a fixed order
+
+        Returns:
+            The stored stage result on a hit, None on a miss
+        """
+        digest, components = key
+        self._current[output_id] = components
+        entry = self.objects / digest
+        meta_path = entry / "meta.json"
+
+        if self.enabled and meta_path.exists():
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+                store = active_store()
+                for record in meta["files"]:
+                    dest = Path(outputs[record["index"]])
+                    if store is not None and store.covers(dest):
+                        store.put_bytes(dest, (entry / str(record["index"])).read_bytes())
+                    elif not dest.exists() or file_digest(dest) != record["sha256"]:
+                        dest.parent.mkdir(parents=True, exist_ok=True)
+                        prepare_write(dest)
+                        shutil.copyfile(entry / str(record["index"]), dest)
+                os.utime(meta_path)
+                self.hits += 1
+                return meta["result"]
+            except (OSError, ValueError, KeyError, IndexError):
+                pass
+
+        self.misses.append((output_id, self._reasons(output_id, components)))
+        return None
+
+    def store(self, key, outputs, result=None):
+        """
+        Store an output group after it was built.
+
+        Args:
+            key: (digest, components) from key()
+            outputs: Destination paths of the group, same order as fetch();
+                paths that were not written are skipped
+            result: JSON-serializable stage result to return on later hits
+        """
+        if not self.enabled:
+            return
+
+        digest, components = key
+        entry = self.objects / digest
+        if entry.exists():
+            return
+
+        tmp = self.objects / f".tmp-{digest}-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        try:
+            tmp.mkdir(parents=True)
+        except OSError:
+            # Read-only checkout: build without caching
+            return
+
+        files = []
+        size = 0
+        for index, path in enumerate(outputs):
+            data = _read_output(path)
+            if data is None:
+                continue
+            sha256 = hashlib.sha256(data).hexdigest()
+            # In-place stages: an output still equal to its source needs no copy
+            if components.get(f"source:{_display(path)}") == sha256:
+                continue
+            (tmp / str(index)).write_bytes(data)
+            files.append({"index": index, "sha256": sha256})
+            size += len(data)
+
+        with open(tmp / "meta.json", 'w') as f:
+            json.dump({"files": files, "size": size, "result": result}, f)
+
+        try:
+            os.replace(tmp, entry)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def evict(self):
+        """Drop least recently used entries until under max_bytes."""
+        if not self.objects.exists():
+            return 0
+
+        entries = []
+        total = 0
+        for entry in os.scandir(self.objects):
+            meta_path = Path(entry.path) / "meta.json"
+            try:
+                with open(meta_path, 'r') as f:
+                    size = json.load(f)["size"]
+                used = meta_path.stat().st_mtime
+            except (OSError, ValueError, KeyError):
+                continue
+            entries.append((used, size, entry.path))
+            total += size
+
+        removed = 0
+        for used, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def finish(self):
+        """Persist explain records, evict, and print the cache summary."""
+        if self._current:
+            records = dict(self._previous)
+            records.update(self._current)
+            try:
+                self.explain_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.explain_file.with_suffix(".tmp")
+                with open(tmp, 'w') as f:
+                    json.dump(records, f, indent=1, sort_keys=True)
+                os.replace(tmp, self.explain_file)
+            except OSError:
+                pass
+
+        if self.enabled:
+            self.evict()
+
+        total = self.hits + len(self.misses)
+        if total:
+            print(f"  Cache: {self.hits} hit, {len(self.misses)} rebuilt")
+        if self.explain:
+            for output_id, reasons in self.misses:
+                print(f"    ↻ {output_id}: {'; '.join(reasons)}")
+
+
+def _traced_build(func, describe, item):
+    """func(item) inside a span for a cache miss (runs in pool workers too)."""
+    with tracing.span(describe(item)[0], cache="miss"):
+        tracing.add(cache_misses=1)
+        return func(item)
+
+
+def run_cached(cache, items, func, describe, run=None, cacheable=None):
+    """
+    Run func over items, skipping those whose outputs are cached.
+
+    Args:
+        cache: BuildCache for the stage
+        items: Work items
+        func: Function item -> JSON-serializable result (writes the outputs)
+        describe: Function item -> (output_id, sources, params, outputs)
+        run: Optional runner run(func, items) -> results, e.g. a
+             functools.partial of parallel.run_parallel
+        cacheable: Optional predicate result -> bool; failed results
+             should return False so they are retried next time
+
+    Returns:
+        Results in item order (cached results for hits)
+    """
+    items = list(items)
+    described = [describe(item) for item in items]
+    keys = [cache.key(sources, params) for _, sources, params, _ in described]
+
+    results = [None] * len(items)
+    pending = []
+    for index, ((output_id, _, _, outputs), key) in enumerate(zip(described, keys)):
+        with tracing.span(output_id, "cache"):
+            cached = cache.fetch(output_id, key, outputs)
+            if cached is not None:
+                tracing.annotate(cache="hit")
+                tracing.add(cache_hits=1, files=len(outputs))
+        if cached is None:
+            pending.append(index)
+        else:
+            results[index] = cached
+
+    if tracing.active_tracer() is not None:
+        func = partial(_traced_build, func, describe)
+    run = run or (lambda f, xs: [f(x) for x in xs])
+    fresh = run(func, [items[i] for i in pending])
+
+    for index, result in zip(pending, fresh):
+        results[index] = result
+        if cacheable is None or cacheable(result):
+            cache.store(keys[index], described[index][3], result)
+
+    return results
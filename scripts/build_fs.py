@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Build tree setup with reflinks / hard links instead of full copies.
+
+sync_tree() mirrors theme_source into build/ incrementally: files whose
+size and mtime already match the source are left alone, changed or
+missing files are re-created, and files that no longer exist in the
+source are removed. New files are created, in order of preference, as:
+
+    reflink   copy-on-write clone (FICLONE; Btrfs, XFS, ...)
+    hardlink  shares the source inode
+    copy      plain copy with metadata
+
+A hard-linked build file shares its bytes with theme_source, so every
+stage must call prepare_write() on a build file before writing to it.
+That unlinks a file with more than one link, so the write creates a
+private file instead of going through to the source. Reflinks and
+copies are already private and are left untouched.
+"""
+
+import errno
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl request number for FICLONE on Linux (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+
+LINK_MODES = ("auto", "reflink", "hardlink", "copy")
+
+# Errors meaning "this link method is not available here", not a real failure
+_UNSUPPORTED = {
+    errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOTTY,
+    errno.EOPNOTSUPP, getattr(errno, "ENOTSUP", errno.EOPNOTSUPP), errno.EMLINK,
+}
+
+
+def prepare_write(path):
+    """
+    Make a build file safe to overwrite.
+
+    Removes the path if it is hard-linked (st_nlink > 1), so the caller's
+    write creates a new private file and the linked source stays intact.
+    """
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflink not supported")
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _hardlink(src, dst):
+    os.link(src, dst)
+
+
+def _copy(src, dst):
+    shutil.copy2(src, dst)
+
+
+_METHODS = {"reflink": _reflink, "hardlink": _hardlink, "copy": _copy}
+
+
+class TreeLinker:
+    """Creates build files by the cheapest method that works on this filesystem."""
+
+    def __init__(self, mode="auto"):
+        if mode not in LINK_MODES:
+            raise ValueError(f"Unknown link mode: {mode}")
+        self.methods = ["reflink", "hardlink", "copy"] if mode == "auto" else [mode]
+        self.counts = {name: 0 for name in _METHODS}
+
+    def place(self, src, dst):
+        """Create dst from src; falls back (and stays fallen back) on unsupported errors."""
+        while True:
+            method = self.methods[0]
+            try:
+                _METHODS[method](src, dst)
+                self.counts[method] += 1
+                return method
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED or len(self.methods) == 1:
+                    raise
+                self.methods.pop(0)
+
+
+def _up_to_date(src_stat, dst_path):
+    try:
+        dst_stat = os.stat(dst_path)
+    except FileNotFoundError:
+        return False
+    if (dst_stat.st_dev, dst_stat.st_ino) == (src_stat.st_dev, src_stat.st_ino):
+        return True
+    return (
+        dst_stat.st_size == src_stat.st_size
+        and int(dst_stat.st_mtime) == int(src_stat.st_mtime)
+    )
+
+
+def sync_file(src, dst, linker):
+    """
+    Bring one build file in line with its source.
+
+    Returns:
+        True if dst was (re)created, False if it was already up to date
+    """
+    src_stat = os.stat(src)
+    if _up_to_date(src_stat, dst):
+        return False
+    if os.path.lexists(dst):
+        os.unlink(dst)
+    linker.place(src, dst)
+    return True
+
+
+def sync_tree(src, dst, linker):
+    """
+    Mirror a source tree into dst incrementally.
+
+    Returns:
+        Dict with "placed", "unchanged" and "removed" counts
+    """
+    stats = {"placed": 0, "unchanged": 0, "removed": 0}
+
+    def walk(src_dir, dst_dir):
+        os.makedirs(dst_dir, exist_ok=True)
+        seen = set()
+        for entry in os.scandir(src_dir):
+            seen.add(entry.name)
+            target = os.path.join(dst_dir, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                if os.path.lexists(target) and not os.path.isdir(target):
+                    os.unlink(target)
+                walk(entry.path, target)
+            elif sync_file(entry.path, target, linker):
+                stats["placed"] += 1
+            else:
+                stats["unchanged"] += 1
+
+        for entry in os.scandir(dst_dir):
+            if entry.name in seen:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+            stats["removed"] += 1
+
+    walk(str(src), str(dst))
+    return stats
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Encoding profiles shared by every build stage.
+
+A profile fixes how PNGs are written and how the theme zip is deflated:
+
+    default   Pillow's PNG defaults, zip deflate level 6 (the output of
+              earlier builds, byte for byte)
+    dev       compress_level=1 PNGs and stored (uncompressed) zip entries,
+              for the fastest edit-build-load loop
+    release   compress_level=9 with optimize=True, zip deflate level 9, and
+              every packaged PNG losslessly optimized (optimize_pngs.py)
+
+The profile is read from BUILD_PROFILE; build_all.py --profile and
+build_theme.py --profile set it. Stages write PNGs through save_png() /
+encode_png() and package with zip_level(), so the choice is applied the
+same way everywhere. Non-default profiles are part of the build cache
+key, so outputs encoded under one profile are never restored under
+another.
+"""
+
+import io
+import os
+from dataclasses import dataclass, field
+
+import tracing
+
+
+@dataclass(frozen=True)
+class Profile:
+    """PNG save options, zip deflate level and packaging passes of one profile."""
+    name: str
+    png: dict = field(default_factory=dict)
+    zip_level: int = 6
+    optimize_pngs: bool = False
+
+
+PROFILES = {
+    "default": Profile("default"),
+    "dev": Profile("dev", {"compress_level": 1}, zip_level=0),
+    "release": Profile("release", {"compress_level": 9, "optimize": True}, zip_level=9,
+                       optimize_pngs=True),
+}
+
+DEFAULT_PROFILE = "default"
+
+
+def current_profile():
+    """Profile named by BUILD_PROFILE, else the default."""
+    name = os.environ.get("BUILD_PROFILE") or DEFAULT_PROFILE
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown BUILD_PROFILE '{name}' (expected one of: {', '.join(PROFILES)})"
+        ) from None
+
+
+def use_profile(name):
+    """Select a profile for this process and the workers it starts."""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile '{name}'")
+    os.environ["BUILD_PROFILE"] = name
+
+
+def add_profile_argument(parser):
+    """Add a --profile option to an argparse parser."""
+    parser.add_argument(
+        "--profile", choices=list(PROFILES), default=None,
+        help="Encoding profile: dev (fast), release (smallest) "
+             "(default: BUILD_PROFILE or 'default')",
+    )
+
+
+def save_png(image, dest):
+    """Save an image as PNG (to a path or a file object) with the profile's options."""
+    if not isinstance(dest, (str, os.PathLike)):
+        image.save(dest, format="PNG", **current_profile().png)
+        return
+    with tracing.file_span(dest):
+        image.save(dest, format="PNG", **current_profile().png)
+        tracing.add(files=1, pixels=image.width * image.height,
+                    bytes_written=os.path.getsize(dest))
+
+
+def encode_png(image):
+    """PNG bytes of an image, encoded with the profile's options."""
+    buffer = io.BytesIO()
+    save_png(image, buffer)
+    return buffer.getvalue()
+
+
+def zip_level():
+    """Deflate level for the theme zip (0 stores entries uncompressed)."""
+    return current_profile().zip_level
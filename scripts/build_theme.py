@@ -4,11 +4,21 @@ Default 7.0 DarkMinimal Theme Builder
 Creates zip and deploys to REAPER ColorThemes folders.
 """
 
+import argparse
 import os
 import sys
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import zipfile
+
+from asset_catalog import catalog
+from build_cache import file_digest
+from build_profile import add_profile_argument, current_profile, use_profile, zip_level
+from image_store import active_store
+from theme_zip import update_zip, write_zip
+import tracing
 
 # Paths
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -16,6 +26,10 @@ BUILD_DIR = PROJECT_ROOT / "build" / "Default_7.0_DarkMinimal_unpacked"
 THEME_FILE = PROJECT_ROOT / "build" / "Default_7.0_DarkMinimal_unpacked.ReaperTheme"
 OUTPUT_ZIP = PROJECT_ROOT / "Default_7.0_DarkMinimal.ReaperThemeZip"
 
+# Source theme the build directory is synced from (see build_all.py)
+SOURCE_DIR = PROJECT_ROOT / "theme_source" / "Default_7.0_unpacked"
+SOURCE_THEME = PROJECT_ROOT / "theme_source" / "Default_7.0_unpacked.ReaperTheme"
+
 # Load deployment configuration
 # Users should copy deploy_config.example.py to deploy_config.py and customize
 try:
@@ -26,62 +40,180 @@ except ImportError:
     # No deploy_config.py found - skip deployment
     DEPLOY_DIRS = []
 
+# Targets written at once (they are often network shares, so I/O bound)
+DEPLOY_JOBS = 8
 
-def create_zip():
-    """Create the theme zip file."""
-    if OUTPUT_ZIP.exists():
-        OUTPUT_ZIP.unlink()
-    
-    with zipfile.ZipFile(OUTPUT_ZIP, 'w', zipfile.ZIP_DEFLATED) as zf:
-        # Add theme file
-        zf.write(THEME_FILE, THEME_FILE.name)
-        
-        # Add all files from unpacked folder
-        for root, dirs, files in os.walk(BUILD_DIR):
-            for file in files:
-                file_path = Path(root) / file
-                arc_name = f"Default_7.0_DarkMinimal_unpacked/{file_path.relative_to(BUILD_DIR)}"
-                zf.write(file_path, arc_name)
-    
-    print(f"Created: {OUTPUT_ZIP}")
+
+def stream_sources():
+    """Archive top-level names mapped to the source files they start from."""
+    return {BUILD_DIR.name: SOURCE_DIR, THEME_FILE.name: SOURCE_THEME}
+
+
+def _members(roots):
+    """(archive name, path) of every file under {top-level name: path} roots."""
+    files = []
+    for top, root in roots.items():
+        if catalog().exists(root):
+            files.append((top, root))
+            continue
+        files += [
+            (f"{top}/{Path(os.path.relpath(asset.path, root)).as_posix()}", asset.path)
+            for asset in catalog().find(under=root)
+        ]
+    return files
+
+
+def create_zip(full=False, stream=False, output=OUTPUT_ZIP):
+    """
+    Create or update the theme zip file.
+
+    Entries are compressed in parallel and written in sorted order with
+    fixed timestamps, so identical inputs give a byte-identical archive.
+    Unless full is set, members of an existing archive whose content is
+    unchanged keep their compressed bytes instead of being re-deflated.
+    Files changed in the image store are taken from it, encoded once.
+    The deflate level comes from the build profile (see build_profile.py),
+    which may also ask for PNG members to be losslessly optimized first.
+
+    With stream set, the archive is assembled from the source theme plus
+    the store's changed files, without reading build/.
+    """
+    if stream:
+        files = _members(stream_sources())
+    else:
+        # Stages may have added files since the last scan
+        catalog().refresh(BUILD_DIR)
+        files = _members({BUILD_DIR.name: BUILD_DIR, THEME_FILE.name: THEME_FILE})
+
+    store = active_store()
+    if store is not None:
+        names = {name for name, _ in files}
+        files = [
+            (name, store.read_bytes(name) if store.is_dirty(name) else path)
+            for name, path in files
+        ]
+        files += [(name, store.read_bytes(name)) for name in store.dirty_names() if name not in names]
+
+    if current_profile().optimize_pngs:
+        from optimize_pngs import optimize_members, print_report
+
+        files, report = optimize_members(files)
+        print_report(report)
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if full:
+        count = write_zip(output, files, zip_level())
+        print(f"Created: {output} ({count} files)")
+    else:
+        reused, compressed = update_zip(output, files, zip_level())
+        print(f"Created: {output} ({compressed} compressed, {reused} unchanged)")
+    if tracing.active_tracer() is not None:
+        # Member spans run on the packaging threads, outside this stage's span
+        read = sum(len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source)
+                   for _, source in files)
+        tracing.add(files=len(files), bytes_read=read, bytes_written=output.stat().st_size)
 
 
-def deploy():
-    """Copy zip to REAPER ColorThemes folders (portable + system)."""
+def _deploy_to(output, size, digest, deploy_dir):
+    """
+    Copy the zip into one ColorThemes folder.
+
+    The copy is written to a temporary file in the folder and renamed over
+    the old zip, so REAPER never sees a partial file. A target that already
+    holds the same bytes (size, then SHA-256) is left alone.
+
+    Returns:
+        (status, seconds, error) with status one of "copied", "unchanged",
+        "missing" or "failed"
+    """
+    start = time.perf_counter()
+    if not deploy_dir.is_dir():
+        return "missing", 0.0, None
+
+    dest = deploy_dir / output.name
+    try:
+        if dest.is_file() and dest.stat().st_size == size and file_digest(dest) == digest:
+            return "unchanged", time.perf_counter() - start, None
+
+        tmp = deploy_dir / f".{output.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copy2(output, tmp)
+            os.replace(tmp, dest)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+    except OSError as e:
+        return "failed", time.perf_counter() - start, e
+    return "copied", time.perf_counter() - start, None
+
+
+def deploy(output=OUTPUT_ZIP):
+    """Copy zip to REAPER ColorThemes folders (portable + system), concurrently."""
     if not DEPLOY_DIRS:
         print("  ⚠ No deployment targets configured.")
         print("  → Copy 'deploy_config.example.py' to 'deploy_config.py' and customize paths.")
         return
 
-    deployed_count = 0
-    for deploy_dir in DEPLOY_DIRS:
-        if deploy_dir.exists():
-            dest = deploy_dir / OUTPUT_ZIP.name
-            shutil.copy2(OUTPUT_ZIP, dest)
-            print(f"  ✓ {dest}")
-            deployed_count += 1
-        else:
+    output = Path(output)
+    size = output.stat().st_size
+    digest = file_digest(output)
+    with ThreadPoolExecutor(max_workers=min(DEPLOY_JOBS, len(DEPLOY_DIRS))) as pool:
+        results = list(pool.map(
+            lambda deploy_dir: _deploy_to(output, size, digest, Path(deploy_dir)), DEPLOY_DIRS
+        ))
+
+    counts = {}
+    for deploy_dir, (status, seconds, error) in zip(DEPLOY_DIRS, results):
+        counts[status] = counts.get(status, 0) + 1
+        dest = Path(deploy_dir) / output.name
+        if status == "missing":
             print(f"  ⚠ Not found: {deploy_dir}")
+        elif status == "failed":
+            print(f"  ✗ {dest}: {error}")
+        else:
+            mark = "✓" if status == "copied" else "="
+            print(f"  {mark} {dest} ({status}, {seconds * 1000:.0f} ms)")
 
-    if deployed_count == 0:
+    if counts.get("missing", 0) == len(DEPLOY_DIRS):
         print("  ⚠ No valid deployment targets found. Check paths in deploy_config.py")
+        return
+    print(f"  Deployed: {counts.get('copied', 0)} copied, {counts.get('unchanged', 0)} unchanged, "
+          f"{counts.get('failed', 0)} failed, {counts.get('missing', 0)} not found")
 
 
-def main():
+def build(full=False, stream=False, output=OUTPUT_ZIP, deploy_zip=True):
+    """Package the build directory (or, with stream, the image store) and deploy it."""
     print("=" * 50)
     print("DarkMinimal Theme Builder")
     print("=" * 50)
     
     print("\n[1/2] Creating zip...")
-    create_zip()
+    create_zip(full, stream, output)
     
     print("\n[2/2] Deploying...")
-    deploy()
+    if deploy_zip:
+        deploy(output)
+    else:
+        print("  Skipped (--no-deploy)")
     
     print("\n" + "=" * 50)
     print("Done! Reload theme in REAPER.")
     print("=" * 50)
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Package and deploy the theme")
+    parser.add_argument(
+        "--full", action="store_true",
+        help="Recompress every entry instead of updating the existing zip",
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        use_profile(args.profile)
+    build(full=args.full)
+
+
 if __name__ == "__main__":
     main()
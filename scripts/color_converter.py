@@ -4,24 +4,11 @@ REAPER Theme Color Converter
 Converts hex colors to REAPER's BGR decimal format
 """
 
-def hex_to_reaper(hex_color: str) -> int:
-    """Convert hex color (#RRGGBB) to REAPER RGB decimal format"""
-    hex_color = hex_color.lstrip('#')
-    r = int(hex_color[0:2], 16)
-    g = int(hex_color[2:4], 16)
-    b = int(hex_color[4:6], 16)
-    # REAPER uses RGB format: R + G*256 + B*65536
-    return r + (g * 256) + (b * 65536)
+from pathlib import Path
 
-def reaper_to_hex(reaper_color: int) -> str:
-    """Convert REAPER BGR decimal to hex color (#RRGGBB)"""
-    if reaper_color < 0:
-        # Handle negative values (alpha blending)
-        reaper_color = reaper_color & 0xFFFFFFFF
-    b = reaper_color % 256
-    g = (reaper_color // 256) % 256
-    r = (reaper_color // 65536) % 256
-    return f"#{r:02x}{g:02x}{b:02x}"
+from reaper_theme import COLOR_SECTION, ReaperTheme, hex_to_reaper, reaper_to_hex
+
+THEME_SOURCE = Path(__file__).parent.parent / "theme_source" / "Default_7.0_unpacked.ReaperTheme"
 
 # =============================================================================
 # FIGMA DARK MINIMAL PALETTE
@@ -144,8 +131,19 @@ if __name__ == "__main__":
         "midi_leftbg": "bg_elevated",
     }
     
+    theme = ReaperTheme.load(THEME_SOURCE) if THEME_SOURCE.exists() else None
+    missing = []
+    
     for theme_var, palette_name in mappings.items():
         reaper_val = REAPER_COLORS[palette_name]
         hex_val = FIGMA_PALETTE[palette_name]
-        print(f"{theme_var}={reaper_val}  # {hex_val} ({palette_name})")
+        current = theme.get(COLOR_SECTION, theme_var) if theme else None
+        if theme and current is None:
+            missing.append(theme_var)
+        was = f", was {current}" if current else ""
+        print(f"{theme_var}={reaper_val}  # {hex_val} ({palette_name}{was})")
+    
+    if missing:
+        print()
+        print(f"⚠ Not in {THEME_SOURCE.name}: {', '.join(missing)}")
 
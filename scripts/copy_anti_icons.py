@@ -6,6 +6,8 @@ Copy ALL icons from Anti Theme to Default 7.0 base, except transport.
 import shutil
 from pathlib import Path
 
+from asset_catalog import catalog
+
 PROJECT_ROOT = Path(__file__).parent.parent
 ANTI_THEME = PROJECT_ROOT / "theme_source/AntiTheme/LCS_Flat-Anti-7_unpacked"
 DEFAULT_THEME = PROJECT_ROOT / "theme_source/Default_7.0_unpacked"  # Copy to source, not build
@@ -17,7 +19,7 @@ def copy_icons():
     copied = 0
 
     # Copy from root directory
-    for source_file in ANTI_THEME.glob("*.png"):
+    for source_file in catalog().files(ANTI_THEME, "*.png"):
         # Skip transport icons (we have custom ones)
         if "transport_" in source_file.name:
             print(f"  ⊗ Skipped: {source_file.name} (custom transport)")
@@ -33,10 +35,10 @@ def copy_icons():
         anti_dpi = ANTI_THEME / dpi_folder
         default_dpi = DEFAULT_THEME / dpi_folder
 
-        if not anti_dpi.exists() or not default_dpi.exists():
+        if not catalog().has_dir(anti_dpi) or not catalog().has_dir(default_dpi):
             continue
 
-        for source_file in anti_dpi.glob("*.png"):
+        for source_file in catalog().files(anti_dpi, "*.png"):
             # Skip transport icons
             if "transport_" in source_file.name:
                 continue
@@ -6,6 +6,11 @@ Copy FX files from LCS theme (keeping original teal color).
 import shutil
 from pathlib import Path
 
+from asset_catalog import catalog
+from build_fs import prepare_write
+from image_store import active_store
+import tracing
+
 PROJECT_ROOT = Path(__file__).parent.parent
 LCS_DIR = PROJECT_ROOT / "theme_source" / "LCS_Flat-707_unpacked"
 BUILD_DIR = PROJECT_ROOT / "build" / "Default_7.0_DarkMinimal_unpacked"
@@ -55,25 +60,38 @@ FX_FILES = [
 ]
 
 
+def copy_file(src, dst):
+    """Copy one file into the build (into the image store when one is active)."""
+    with tracing.file_span(dst):
+        size = src.stat().st_size
+        tracing.add(files=1, bytes_read=size, bytes_written=size)
+        store = active_store()
+        if store is not None:
+            store.put_bytes(dst, src.read_bytes())
+            return
+        dst.parent.mkdir(exist_ok=True)
+        prepare_write(dst)
+        shutil.copy(src, dst)
+
+
 def copy_fx_files():
     """Copy all FX files from LCS to build directory."""
     
     for name in FX_FILES:
         src = LCS_DIR / name
-        if not src.exists():
+        if not catalog().exists(src):
             print(f"  ⚠ {name} not found in LCS")
             continue
             
         # Copy base file
-        shutil.copy(src, BUILD_DIR / name)
+        copy_file(src, BUILD_DIR / name)
         
         # Copy DPI variants
         for dpi in ["150", "200"]:
             src_dpi = LCS_DIR / dpi / name
             dst_dpi = BUILD_DIR / dpi / name
-            if src_dpi.exists():
-                dst_dpi.parent.mkdir(exist_ok=True)
-                shutil.copy(src_dpi, dst_dpi)
+            if catalog().exists(src_dpi):
+                copy_file(src_dpi, dst_dpi)
         
         print(f"  ✓ {name}")
 
@@ -4,56 +4,106 @@ Create REAPER sprite sheets from single icon images.
 REAPER expects 3 states horizontally: [Normal] [Hover] [Active]
 """
 
-from PIL import Image, ImageEnhance
+import argparse
 import os
+from functools import partial
 from pathlib import Path
 
+from asset_catalog import catalog
+from build_cache import BuildCache, add_cache_arguments, run_cached
+from parallel import add_parallel_arguments, decoded_size, parallel_options, run_parallel
+from sprite_engine import ENGINE
+
 # Paths
 SRC_DIR = Path(__file__).parent.parent / "assets" / "transport"
 BUILD_DIR = Path(__file__).parent.parent / "build" / "Default_7.0_DarkMinimal_unpacked"
 
+# Scripts whose changes invalidate cached sprites
+CODE_FILES = [__file__, Path(__file__).parent / "sprite_engine.py"]
+
 # Square frames to maintain icon proportions
 FRAME_SIZE = (44, 44)  # Square for balanced icons
 # Gap between frames  
 FRAME_GAP = 2
 
+# DPI folders
+DPI_SCALES = {
+    "": 1.0,
+    "150": 1.5,
+    "200": 2.0,
+}
+
+
+def dest_paths(dest_names, dpi_folder):
+    """Destination paths of a DPI tier."""
+    dest_dir = BUILD_DIR / dpi_folder if dpi_folder else BUILD_DIR
+    return [dest_dir / name for name in dest_names]
 
-def create_sprite_sheet(img, brightness_factors=(1.0, 1.1, 1.2)):
+
+def group_mappings(mappings):
     """
-    Create a 3-frame horizontal sprite sheet from a single image.
-    
-    Args:
-        img: PIL Image
-        brightness_factors: Tuple of 3 brightness multipliers for each state
-    
+    Group (source, dest, brightness) mappings by source.
+
     Returns:
-        PIL Image with 3 frames side by side
+        List of (source, [(brightness, [dest names])]) with destinations
+        that share a brightness tuple (identical sprites) merged
     """
-    # Resize to frame size
-    frame = img.resize(FRAME_SIZE, Image.Resampling.LANCZOS)
-    
-    # Create 3 variations
-    frames = []
-    for factor in brightness_factors:
-        if factor != 1.0:
-            enhancer = ImageEnhance.Brightness(frame)
-            frames.append(enhancer.enhance(factor))
-        else:
-            frames.append(frame.copy())
+    groups = {}
+    for src_name, dest_name, brightness in mappings:
+        by_factors = groups.setdefault(src_name, {})
+        by_factors.setdefault(tuple(brightness), []).append(dest_name)
+    return [(src, list(by_factors.items())) for src, by_factors in groups.items()]
+
+
+def render_source(group):
+    """
+    Render every sprite of one source at every DPI and save them.
+
+    Identical sprites are rendered once and written to each name.
+    Runs in a worker process; returns the log lines for the group.
+    """
+    src_name, sprites = group
+    src_path = SRC_DIR / src_name
     
-    # Combine horizontally with gaps
-    cell_width = FRAME_SIZE[0] + FRAME_GAP
-    sprite_width = cell_width * 3
-    sprite_height = FRAME_SIZE[1]
-    sprite = Image.new('RGBA', (sprite_width, sprite_height), (0, 0, 0, 0))
+    if not catalog().exists(src_path):
+        return [f"  ⚠ Missing: {src_name}"]
     
-    for i, f in enumerate(frames):
-        sprite.paste(f, (i * cell_width, 0))
+    for dpi_folder, scale in DPI_SCALES.items():
+        # Scale frame size and gap for DPI
+        scaled_frame = (int(FRAME_SIZE[0] * scale), int(FRAME_SIZE[1] * scale))
+        scaled_gap = int(FRAME_GAP * scale)
+        frame_key, _ = ENGINE.frame(src_path, scaled_frame)
+        
+        for brightness, dest_names in sprites:
+            sheet_key, _ = ENGINE.sheet(frame_key, brightness, gap=scaled_gap)
+            ENGINE.write(sheet_key, dest_paths(dest_names, dpi_folder))
     
-    return sprite
+    return [
+        f"  ✓ {src_name} → {dest_name}"
+        for _, dest_names in sprites
+        for dest_name in dest_names
+    ]
+
 
+def describe_group(group):
+    """Cache description of a source group: (output_id, sources, params, outputs)."""
+    src_name, sprites = group
+    outputs = [
+        path
+        for _, dest_names in sprites
+        for folder in DPI_SCALES
+        for path in dest_paths(dest_names, folder)
+    ]
+    params = {
+        "frame_size": FRAME_SIZE,
+        "frame_gap": FRAME_GAP,
+        "sprites": sprites,
+        "dpi_scales": DPI_SCALES,
+    }
+    return src_name, [SRC_DIR / src_name], params, outputs
 
-def process_transport_icons():
+
+def process_transport_icons(jobs=None, memory_budget=None, cache=None):
     """Process all transport icons and create sprite sheets."""
     
     # Mapping: (source_file, dest_file, brightness_factors)
@@ -103,63 +153,27 @@ def process_transport_icons():
     print(f"Sprite size: {cell_width * 3}x{FRAME_SIZE[1]}")
     print()
     
-    # DPI folders
-    dpi_scales = {
-        "": 1.0,
-        "150": 1.5,
-        "200": 2.0,
-    }
-    
-    for src_name, dest_name, brightness in mappings:
-        src_path = SRC_DIR / src_name
-        
-        if not src_path.exists():
-            print(f"  ⚠ Missing: {src_name}")
-            continue
-        
-        img = Image.open(src_path)
-        
-        for dpi_folder, scale in dpi_scales.items():
-            # Scale frame size and gap for DPI
-            scaled_frame = (int(FRAME_SIZE[0] * scale), int(FRAME_SIZE[1] * scale))
-            scaled_gap = int(FRAME_GAP * scale)
-            scaled_cell = scaled_frame[0] + scaled_gap
-            
-            # Resize source to scaled frame size
-            frame = img.resize(scaled_frame, Image.Resampling.LANCZOS)
-            
-            # Create 3 variations
-            frames = []
-            for factor in brightness:
-                if factor != 1.0:
-                    enhancer = ImageEnhance.Brightness(frame)
-                    frames.append(enhancer.enhance(factor))
-                else:
-                    frames.append(frame.copy())
-            
-            # Combine horizontally with gaps
-            sprite_width = scaled_cell * 3
-            sprite_height = scaled_frame[1]
-            sprite = Image.new('RGBA', (sprite_width, sprite_height), (0, 0, 0, 0))
-            
-            for i, f in enumerate(frames):
-                sprite.paste(f, (i * scaled_cell, 0))
-            
-            # Save
-            if dpi_folder:
-                dest_dir = BUILD_DIR / dpi_folder
-            else:
-                dest_dir = BUILD_DIR
-            
-            dest_path = dest_dir / dest_name
-            sprite.save(dest_path)
-        
-        print(f"  ✓ {src_name} → {dest_name}")
+    cache = cache or BuildCache.for_stage("sprites", CODE_FILES)
+    run = partial(
+        run_parallel, jobs=jobs,
+        cost=lambda g: decoded_size(SRC_DIR / g[0]), memory_budget=memory_budget,
+    )
+    results = run_cached(
+        cache, group_mappings(mappings), render_source, describe_group, run=run,
+    )
+    for lines in results:
+        for line in lines:
+            print(line)
+    cache.finish()
     
     print()
     print("Done! Run build_theme.py to package and deploy.")
 
 
 if __name__ == "__main__":
-    process_transport_icons()
-
+    parser = argparse.ArgumentParser(description="Create transport sprite sheets")
+    add_parallel_arguments(parser)
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+    cache = BuildCache.for_stage("sprites", CODE_FILES, args)
+    process_transport_icons(**parallel_options(args), cache=cache)
@@ -4,41 +4,97 @@ Create REAPER sprite sheets for track buttons (mute, solo, recarm).
 REAPER expects 3 states horizontally: [Normal] [Hover] [Active]
 """
 
-from PIL import Image, ImageEnhance
+import argparse
+from functools import partial
 from pathlib import Path
 
+from asset_catalog import catalog
+from build_cache import BuildCache, add_cache_arguments, run_cached
+from parallel import add_parallel_arguments, decoded_size, parallel_options, run_parallel
+from sprite_engine import ENGINE
+
 # Paths
 ASSETS_DIR = Path(__file__).parent.parent / "assets" / "track"
 BUILD_DIR = Path(__file__).parent.parent / "build" / "Default_7.0_DarkMinimal_unpacked"
 
+# Scripts whose changes invalidate cached sprites
+CODE_FILES = [__file__, Path(__file__).parent / "sprite_engine.py"]
+
 # Target size for each frame (REAPER track buttons are 20x20)
 FRAME_SIZE = (20, 20)
 FRAME_GAP = 0  # No gap for track buttons
 
+# DPI folders
+DPI_SCALES = {
+    "": 1.0,
+    "150": 1.5,
+    "200": 2.0,
+}
 
-def create_sprite_sheet(img, brightness_factors=(1.0, 1.15, 1.0)):
-    """Create a 3-frame horizontal sprite sheet from a single image."""
-    frame = img.resize(FRAME_SIZE, Image.Resampling.LANCZOS)
-    
-    frames = []
-    for factor in brightness_factors:
-        if factor != 1.0:
-            enhancer = ImageEnhance.Brightness(frame)
-            frames.append(enhancer.enhance(factor))
-        else:
-            frames.append(frame.copy())
+
+def dest_paths(dest_names, dpi_folder):
+    """Destination paths of a DPI tier."""
+    dest_dir = BUILD_DIR / dpi_folder if dpi_folder else BUILD_DIR
+    return [dest_dir / name for name in dest_names]
+
+
+def group_mappings(mappings):
+    """
+    Group (source, dest_names, brightness) mappings by source.
+
+    Returns:
+        List of (source, [(brightness, [dest names])]) with destinations
+        that share a brightness tuple (identical sprites) merged
+    """
+    groups = {}
+    for src_name, dest_names, brightness in mappings:
+        by_factors = groups.setdefault(src_name, {})
+        by_factors.setdefault(tuple(brightness), []).extend(dest_names)
+    return [(src, list(by_factors.items())) for src, by_factors in groups.items()]
+
+
+def render_source(group):
+    """
+    Render every sprite of one source at every DPI and save them.
+
+    Identical sprites are rendered once and written to each name.
+    Runs in a worker process; returns the log lines for the group.
+    """
+    src_name, sprites = group
+    src_path = ASSETS_DIR / src_name
     
-    sprite_width = FRAME_SIZE[0] * 3
-    sprite_height = FRAME_SIZE[1]
-    sprite = Image.new('RGBA', (sprite_width, sprite_height), (0, 0, 0, 0))
+    if not catalog().exists(src_path):
+        return [f"  ⚠ Missing: {src_name}"]
     
-    for i, f in enumerate(frames):
-        sprite.paste(f, (i * FRAME_SIZE[0], 0))
+    for dpi_folder, scale in DPI_SCALES.items():
+        scaled_frame = (int(FRAME_SIZE[0] * scale), int(FRAME_SIZE[1] * scale))
+        frame_key, _ = ENGINE.frame(src_path, scaled_frame)
+        
+        for brightness, dest_names in sprites:
+            sheet_key, _ = ENGINE.sheet(frame_key, brightness, gap=FRAME_GAP)
+            ENGINE.write(sheet_key, dest_paths(dest_names, dpi_folder))
     
-    return sprite
+    return [f"  ✓ {src_name} → {', '.join(dest_names)}" for _, dest_names in sprites]
 
 
-def process_track_buttons():
+def describe_group(group):
+    """Cache description of a source group: (output_id, sources, params, outputs)."""
+    src_name, sprites = group
+    outputs = [
+        path
+        for _, dest_names in sprites
+        for folder in DPI_SCALES
+        for path in dest_paths(dest_names, folder)
+    ]
+    params = {
+        "frame_size": FRAME_SIZE,
+        "sprites": sprites,
+        "dpi_scales": DPI_SCALES,
+    }
+    return src_name, [ASSETS_DIR / src_name], params, outputs
+
+
+def process_track_buttons(jobs=None, memory_budget=None, cache=None):
     """Process all track button icons and create sprite sheets."""
     
     # Mapping: (source_file, dest_files, brightness_factors)
@@ -67,57 +123,27 @@ def process_track_buttons():
     print(f"Sprite size: {FRAME_SIZE[0] * 3}x{FRAME_SIZE[1]}")
     print()
     
-    # DPI folders
-    dpi_scales = {
-        "": 1.0,
-        "150": 1.5,
-        "200": 2.0,
-    }
-    
-    for src_name, dest_names, brightness in mappings:
-        src_path = ASSETS_DIR / src_name
-        
-        if not src_path.exists():
-            print(f"  ⚠ Missing: {src_name}")
-            continue
-        
-        img = Image.open(src_path)
-        
-        for dest_name in dest_names:
-            for dpi_folder, scale in dpi_scales.items():
-                scaled_frame = (int(FRAME_SIZE[0] * scale), int(FRAME_SIZE[1] * scale))
-                
-                frame = img.resize(scaled_frame, Image.Resampling.LANCZOS)
-                
-                frames = []
-                for factor in brightness:
-                    if factor != 1.0:
-                        enhancer = ImageEnhance.Brightness(frame)
-                        frames.append(enhancer.enhance(factor))
-                    else:
-                        frames.append(frame.copy())
-                
-                sprite_width = scaled_frame[0] * 3
-                sprite_height = scaled_frame[1]
-                sprite = Image.new('RGBA', (sprite_width, sprite_height), (0, 0, 0, 0))
-                
-                for i, f in enumerate(frames):
-                    sprite.paste(f, (i * scaled_frame[0], 0))
-                
-                if dpi_folder:
-                    dest_dir = BUILD_DIR / dpi_folder
-                else:
-                    dest_dir = BUILD_DIR
-                
-                dest_path = dest_dir / dest_name
-                sprite.save(dest_path)
-            
-        print(f"  ✓ {src_name} → {', '.join(dest_names)}")
+    cache = cache or BuildCache.for_stage("track_sprites", CODE_FILES)
+    run = partial(
+        run_parallel, jobs=jobs,
+        cost=lambda g: decoded_size(ASSETS_DIR / g[0]), memory_budget=memory_budget,
+    )
+    results = run_cached(
+        cache, group_mappings(mappings), render_source, describe_group, run=run,
+    )
+    for lines in results:
+        for line in lines:
+            print(line)
+    cache.finish()
     
     print()
     print("Done! Run build_theme.py to package and deploy.")
 
 
 if __name__ == "__main__":
-    process_track_buttons()
-
+    parser = argparse.ArgumentParser(description="Create track button sprite sheets")
+    add_parallel_arguments(parser)
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+    cache = BuildCache.for_stage("track_sprites", CODE_FILES, args)
+    process_track_buttons(**parallel_options(args), cache=cache)
@@ -8,17 +8,30 @@ Output: 3-frame horizontal sprites (e.g., transport_play.png, transport_play_on.
 REAPER transport buttons are 96x30 (3 frames of 32x30).
 """
 
-from PIL import Image
+import argparse
+from functools import partial
 from pathlib import Path
 
+from asset_catalog import catalog
+from build_cache import BuildCache, add_cache_arguments, run_cached
+from image_store import active_store
+from parallel import add_parallel_arguments, decoded_size, parallel_options, run_parallel
+from sprite_engine import ENGINE
+
 PROJECT_ROOT = Path(__file__).parent.parent
 ASSETS_DIR = PROJECT_ROOT / "assets" / "transport"
 BUILD_DIR = PROJECT_ROOT / "build" / "Default_7.0_DarkMinimal_unpacked"
 
+# Scripts whose changes invalidate cached sprites
+CODE_FILES = [__file__, Path(__file__).parent / "sprite_engine.py"]
+
 # Target frame size for transport buttons (matches LCS)
 FRAME_WIDTH = 32
 FRAME_HEIGHT = 30
 
+# DPI folders and scales written by render_sprite()
+DPI_SCALES = [('', 1.0), ('150', 1.5), ('200', 2.0)]
+
 # Mapping: (asset_name_off, asset_name_on) -> (reaper_name_off, reaper_name_on, reaper_name_off_explicit)
 # Third element is optional - if provided, creates an explicit _off variant
 TRANSPORT_MAPPINGS = {
@@ -34,98 +47,155 @@ TRANSPORT_MAPPINGS = {
 }
 
 
-def create_sprite(img, frame_size=(FRAME_WIDTH, FRAME_HEIGHT)):
+def render_sprite(src_path, dest_names, pyramid=False):
     """
-    Create a 3-frame horizontal sprite from single image.
-    Frames: normal, mouseover, pressed (all same for now).
+    Render the 3-frame sprite for one asset at every DPI and save it
+    under each destination name.
+
+    Frames: normal, mouseover, pressed (all same for now). By default
+    the 1x sprite is scaled up with LANCZOS for the 150 and 200 tiers.
+    With pyramid=True the sprite is rendered once at the largest tier
+    straight from the source and the smaller tiers are downsampled from
+    it (Image.reduce for integer ratios), which keeps the 2x icons sharp.
     """
-    # Scale image to fit frame while maintaining aspect ratio
-    scale_w = frame_size[0] / img.width
-    scale_h = frame_size[1] / img.height
-    scale = min(scale_w, scale_h)  # Fill the frame
-    
-    new_w = int(img.width * scale)
-    new_h = int(img.height * scale)
-    
-    resized = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-    
-    # Create centered frame
-    frame = Image.new('RGBA', frame_size, (0, 0, 0, 0))
-    x = (frame_size[0] - new_w) // 2
-    y = (frame_size[1] - new_h) // 2
-    frame.paste(resized, (x, y), resized)
-    
-    # Create 3-frame sprite (normal, hover, pressed - all same)
-    sprite_width = frame_size[0] * 3
-    sprite = Image.new('RGBA', (sprite_width, frame_size[1]), (0, 0, 0, 0))
-    
-    for i in range(3):
-        sprite.paste(frame, (i * frame_size[0], 0))
-    
-    return sprite
-
+    if not pyramid:
+        frame_key, _ = ENGINE.fitted_frame(src_path, (FRAME_WIDTH, FRAME_HEIGHT))
+        sheet_key, _ = ENGINE.sheet(frame_key, (1.0, 1.0, 1.0))
+        tiers = [(folder, ENGINE.scaled(sheet_key, scale)[0]) for folder, scale in DPI_SCALES]
+    else:
+        top = max(scale for _, scale in DPI_SCALES)
+        frame_key, _ = ENGINE.fitted_frame(
+            src_path, (int(FRAME_WIDTH * top), int(FRAME_HEIGHT * top))
+        )
+        sheet_key, _ = ENGINE.sheet(frame_key, (1.0, 1.0, 1.0))
+        tiers = [
+            (folder, ENGINE.downsampled(
+                sheet_key, (int(FRAME_WIDTH * 3 * scale), int(FRAME_HEIGHT * scale))
+            )[0])
+            for folder, scale in DPI_SCALES
+        ]
+
+    for folder, tier_key in tiers:
+        out_dir = BUILD_DIR / folder if folder else BUILD_DIR
+        ENGINE.write(tier_key, [out_dir / name for name in dest_names])
+
+
+def process_transport_pair(item, pyramid=False, capture=False):
+    """
+    Create the sprites for one (off, on) asset pair at every DPI.
 
-def save_with_dpi(img, base_path):
-    """Save image at 1x, 1.5x, 2x DPI."""
-    for folder, scale in [('', 1.0), ('150', 1.5), ('200', 2.0)]:
-        if folder:
-            out_dir = base_path.parent / folder
-            out_dir.mkdir(exist_ok=True)
-            out_path = out_dir / base_path.name
-        else:
-            out_path = base_path
-        
-        if scale != 1.0:
-            new_size = (int(img.width * scale), int(img.height * scale))
-            scaled = img.resize(new_size, Image.Resampling.LANCZOS)
-            scaled.save(out_path)
+    Runs in a worker process; returns the log lines for the pair. With
+    capture=True nothing is saved and (lines, {path: image}) is returned
+    for the parent's image store instead.
+    """
+    if capture:
+        ENGINE.capture = {}
+        try:
+            lines = process_transport_pair(item, pyramid)
+            return lines, ENGINE.capture
+        finally:
+            ENGINE.capture = None
+
+    (off_name, on_name), mapping = item
+    reaper_off = mapping[0]
+    reaper_on = mapping[1] if len(mapping) > 1 else None
+    reaper_off_explicit = mapping[2] if len(mapping) > 2 else None
+    lines = []
+
+    # Process OFF state (plus the explicit _off variant, if specified)
+    off_path = ASSETS_DIR / off_name
+    if catalog().exists(off_path):
+        off_names = [name for name in (reaper_off, reaper_off_explicit) if name]
+        render_sprite(off_path, off_names, pyramid)
+        lines.extend(f"  ✓ {name}" for name in off_names)
+    else:
+        lines.append(f"  ⚠ {off_name} not found")
+
+    # Process ON state (if it has one)
+    if reaper_on:
+        on_path = ASSETS_DIR / on_name
+        if catalog().exists(on_path):
+            render_sprite(on_path, [reaper_on], pyramid)
+            lines.append(f"  ✓ {reaper_on}")
         else:
-            img.save(out_path)
+            lines.append(f"  ⚠ {on_name} not found")
 
+    return lines
 
-def process_transport_sprites():
-    """Create all transport sprites from Figma assets."""
 
-    for (off_name, on_name), mapping in TRANSPORT_MAPPINGS.items():
-        reaper_off = mapping[0]
-        reaper_on = mapping[1] if len(mapping) > 1 else None
-        reaper_off_explicit = mapping[2] if len(mapping) > 2 else None
+def pair_cost(item):
+    """Decoded bytes for both assets of a pair (for the memory budget)."""
+    (off_name, on_name), _ = item
+    return decoded_size(ASSETS_DIR / off_name) + decoded_size(ASSETS_DIR / on_name)
 
-        # Process OFF state
-        off_path = ASSETS_DIR / off_name
-        if off_path.exists():
-            img = Image.open(off_path)
-            sprite = create_sprite(img)
-            save_with_dpi(sprite, BUILD_DIR / reaper_off)
-            print(f"  ✓ {reaper_off}")
 
-            # Also create explicit _off variant if specified
-            if reaper_off_explicit:
-                save_with_dpi(sprite, BUILD_DIR / reaper_off_explicit)
-                print(f"  ✓ {reaper_off_explicit}")
-        else:
-            print(f"  ⚠ {off_name} not found")
+def describe_pair(item, pyramid=False):
+    """Cache description of a pair: (output_id, sources, params, outputs)."""
+    (off_name, on_name), mapping = item
+    names = [name for name in mapping if name]
+    outputs = [
+        (BUILD_DIR / folder / name) if folder else (BUILD_DIR / name)
+        for name in names
+        for folder, _ in DPI_SCALES
+    ]
+    params = {
+        "frame_size": [FRAME_WIDTH, FRAME_HEIGHT],
+        "mapping": list(mapping),
+        "dpi_scales": DPI_SCALES,
+        "pyramid": pyramid,
+    }
+    return mapping[0], [ASSETS_DIR / off_name, ASSETS_DIR / on_name], params, outputs
+
 
-        # Process ON state (if it has one)
-        if reaper_on:
-            on_path = ASSETS_DIR / on_name
-            if on_path.exists():
-                img = Image.open(on_path)
-                sprite = create_sprite(img)
-                save_with_dpi(sprite, BUILD_DIR / reaper_on)
-                print(f"  ✓ {reaper_on}")
-            else:
-                print(f"  ⚠ {on_name} not found")
+def process_transport_sprites(jobs=None, memory_budget=None, cache=None, pyramid=False):
+    """
+    Create all transport sprites from Figma assets.
+
+    pyramid renders each sprite at the 200 tier and derives the smaller
+    tiers from it instead of upscaling the 1x sprite.
+    """
+    cache = cache or BuildCache.for_stage("transport_sprites", CODE_FILES)
+    run = partial(run_parallel, jobs=jobs, cost=pair_cost, memory_budget=memory_budget)
+
+    store = active_store()
+    if store is not None:
+        # Sprites go to the image store; they are encoded at packaging time
+        def run(func, items, run=run):
+            results = []
+            for lines, images in run(func, items):
+                for path, image in images.items():
+                    store.put(Path(path), image)
+                results.append(lines)
+            return results
+
+    results = run_cached(
+        cache, TRANSPORT_MAPPINGS.items(),
+        partial(process_transport_pair, pyramid=pyramid, capture=store is not None),
+        partial(describe_pair, pyramid=pyramid), run=run,
+    )
+    for lines in results:
+        for line in lines:
+            print(line)
+    cache.finish()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create transport sprite sheets")
+    add_parallel_arguments(parser)
+    add_cache_arguments(parser)
+    parser.add_argument(
+        "--pyramid", action="store_true",
+        help="Render at the 200 tier and downsample to 150/100 (sharper 2x icons)",
+    )
+    args = parser.parse_args()
+
     print("=" * 50)
     print("Transport Sprite Generator")
     print("=" * 50)
     
-    process_transport_sprites()
+    cache = BuildCache.for_stage("transport_sprites", CODE_FILES, args)
+    process_transport_sprites(**parallel_options(args), cache=cache, pyramid=args.pyramid)
     
     print("\n" + "=" * 50)
     print("Done!")
     print("=" * 50)
-
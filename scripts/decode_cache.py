@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of decoded image pixels, shared across builds.
+
+Decoding a PNG means inflating its zlib stream, which dominates the
+cost of reading the small theme icons. The first time a file with given
+content is decoded, its raw pixels are written to
+.build_cache/decoded/<sha256>.raw behind a small header:
+
+    magic (4s)  version (H)  bands (H)  width (I)  height (I)  mode (8s)
+
+Later decodes of the same content (in this or any later run) wrap that
+file as an image or numpy array without inflating it. Entries are read
+into memory with one read; only entries of MAP_MIN_BYTES or more are
+memory-mapped instead, and at most MAX_MAPPINGS at a time. A mapping
+holds a file descriptor for as long as an image uses it, so a process
+keeping hundreds of decoded icons around (the sprite engine, --watch)
+never holds one descriptor per image. Files are keyed by content hash
+from the asset catalog, so a changed source can never hit a stale entry.
+
+Only plain modes (RAW_MODES) without a tRNS transparency key are cached;
+anything else is decoded normally. A file's mtime is its LRU clock, and
+the least recently used entries are evicted once the cache passes
+BUILD_DECODE_CACHE_MAX_MB (0 disables the cache).
+
+Usage:
+    python scripts/decode_cache.py           # summarize
+    python scripts/decode_cache.py --clear
+"""
+
+import argparse
+import mmap
+import os
+import shutil
+import struct
+import threading
+import weakref
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from asset_catalog import catalog
+import tracing
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DECODE_CACHE_DIR = PROJECT_ROOT / ".build_cache" / "decoded"
+
+# Default total size cap for decoded pixels
+DEFAULT_MAX_SIZE_MB = 256
+
+MAGIC = b"RAWI"
+HEADER = struct.Struct("<4sHHII8s")
+
+# Bump when the file layout changes
+CACHE_VERSION = 1
+
+# Modes stored as raw bytes, with their band counts
+RAW_MODES = {"RGBA": 4, "RGB": 3, "LA": 2, "L": 1}
+
+# Entries this large are memory-mapped rather than read (most icons are far smaller)
+MAP_MIN_BYTES = 256 * 1024
+
+# Live mappings per cache; past this, large entries are read too
+MAX_MAPPINGS = 32
+
+
+def default_max_bytes():
+    """Size cap in bytes from BUILD_DECODE_CACHE_MAX_MB, else the default."""
+    mb = int(os.environ.get("BUILD_DECODE_CACHE_MAX_MB", DEFAULT_MAX_SIZE_MB))
+    return mb * 1024 * 1024
+
+
+class DecodeCache:
+    """Content-addressed store of decoded pixel buffers."""
+
+    def __init__(self, root=DECODE_CACHE_DIR, max_bytes=None):
+        """
+        Args:
+            root: Cache directory
+            max_bytes: Size cap (default: BUILD_DECODE_CACHE_MAX_MB; 0 disables)
+        """
+        self.root = Path(root)
+        self.max_bytes = default_max_bytes() if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._total = None  # bytes on disk, scanned on first write
+        self._mappings = 0  # live mmaps, each holding a file descriptor
+        # Separate from _lock: finalizers may run while _lock is held
+        self._mappings_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _path(self, digest):
+        return self.root / f"{digest}.raw"
+
+    def load(self, digest):
+        """
+        Read or memory-map a cached entry (see MAP_MIN_BYTES).
+
+        Returns:
+            (mode, (width, height), buffer) with a read-only memoryview over
+            the pixels, or None on a miss
+        """
+        path = self._path(digest)
+        try:
+            with open(path, 'rb') as f:
+                data = self._map(f) or f.read()
+        except (OSError, ValueError):
+            # Missing, unreadable or empty
+            return None
+
+        if len(data) < HEADER.size:
+            return None
+        magic, version, bands, width, height, mode = HEADER.unpack_from(data)
+        mode = mode.rstrip(b"\0").decode("ascii", "replace")
+        if (magic != MAGIC or version != CACHE_VERSION or RAW_MODES.get(mode) != bands
+                or len(data) != HEADER.size + width * height * bands):
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return mode, (width, height), memoryview(data)[HEADER.size:]
+
+    def _map(self, f):
+        """mmap of an open entry, or None if it is small or too many are live."""
+        if os.fstat(f.fileno()).st_size < MAP_MIN_BYTES:
+            return None
+        with self._mappings_lock:
+            if self._mappings >= MAX_MAPPINGS:
+                return None
+            self._mappings += 1
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._unmapped()
+            raise
+        # The mapping (and its descriptor) goes away with the last image using it
+        weakref.finalize(mapped, self._unmapped)
+        return mapped
+
+    def _unmapped(self):
+        with self._mappings_lock:
+            self._mappings -= 1
+
+    def store(self, digest, image):
+        """Write an image's pixels (skipped silently if the cache is not writable)."""
+        data = image.tobytes()
+        header = HEADER.pack(MAGIC, CACHE_VERSION, RAW_MODES[image.mode],
+                             image.width, image.height, image.mode.encode())
+        path = self._path(digest)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp, 'wb') as f:
+                f.write(header)
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+        with self._lock:
+            if self._total is None:
+                self._total = self._scan()[1]
+            else:
+                self._total += len(header) + len(data)
+            over = self._total > self.max_bytes
+        if over:
+            self.evict()
+
+    def _scan(self):
+        """(entries sorted least recently used first, total bytes)."""
+        entries = []
+        total = 0
+        try:
+            scanned = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return entries, total
+        for entry in scanned:
+            if not entry.name.endswith(".raw"):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+            total += st.st_size
+        return sorted(entries), total
+
+    def evict(self):
+        """Drop least recently used entries until under max_bytes."""
+        with self._lock:
+            entries, total = self._scan()
+            removed = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    # Open mappings keep their pages after the unlink
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # Still mapped on Windows, or read-only: leave it for a later eviction
+                    continue
+                total -= size
+                removed += 1
+            self._total = total
+            return removed
+
+    def image(self, path, digest=None):
+        """
+        Decoded image of a file, taken from the cache when possible.
+
+        Cached images are read-only views of the cached pixels (Pillow
+        copies them on first modification) and carry no PNG metadata.
+
+        Args:
+            path: Image file
+            digest: Content SHA-256 if already known (default: from the catalog)
+        """
+        if self.enabled:
+            digest = digest or catalog().digest(path)
+            entry = self.load(digest) if digest else None
+            if entry is not None:
+                self.hits += 1
+                mode, size, buffer = entry
+                tracing.add(bytes_read=len(buffer))
+                return Image.frombuffer(mode, size, buffer, "raw", mode, 0, 1)
+
+        image = Image.open(path)
+        image.load()
+        tracing.add(bytes_read=os.path.getsize(path))
+        if self.enabled and digest and image.mode in RAW_MODES and "transparency" not in image.info:
+            self.misses += 1
+            self.store(digest, image)
+        return image
+
+    def rgba_array(self, path, digest=None):
+        """
+        (height, width, 4) uint8 RGBA pixels of a file; a read-only view of
+        the cached entry when the file is stored as RGBA.
+        """
+        image = self.image(path, digest)
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        return np.asarray(image)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def decode_cache():
+    """The decode cache shared by everything running in this process."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = DecodeCache()
+        return _shared
+
+
+def decode(path, digest=None):
+    """Decoded image of a file through the shared cache."""
+    return decode_cache().image(path, digest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decoded pixel cache")
+    parser.add_argument("--clear", action="store_true", help="Remove every cached entry")
+    args = parser.parse_args()
+
+    cache = decode_cache()
+    if args.clear:
+        shutil.rmtree(cache.root, ignore_errors=True)
+        print(f"✓ Cleared {cache.root.relative_to(PROJECT_ROOT)}")
+        return
+
+    entries, total = cache._scan()
+    print(f"  {len(entries)} decoded images, {total / 1024 / 1024:.1f} MB "
+          f"(cap {cache.max_bytes / 1024 / 1024:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Persistent hue/saturation histogram index for theme PNGs.
+
+For every indexed file the index keeps a coarse histogram of its opaque
+pixels (alpha >= MIN_ALPHA): HUE_BINS hue bins by SAT_BINS saturation
+bins, stored sparsely. Histograms are keyed by content hash, so a file
+that is restored, copied or reverted to known bytes is never decoded
+again. Hashes come from the asset catalog, so unchanged files are not
+even re-hashed, and new content is read through the decode cache
+(decode_cache.py), which the recolor stage then maps instead of
+decoding the file a second time.
+
+A recolor rule can then ask which files may contain pixels in its hue
+window above its saturation floor. The query is conservative: a file is
+reported whenever any histogram bin overlaps the window, so it can only
+return files the rule turns out not to change, never miss one.
+
+The index lives in .build_cache/hue_index.json and is updated
+incrementally by the recolor planner; run this script to (re)index the
+whole theme tree:
+
+    python scripts/hue_index.py                    # index theme_source and build
+    python scripts/hue_index.py --query 80 200 0.15
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from asset_catalog import catalog
+from decode_cache import decode
+from recolor_kernel import MIN_ALPHA, rgb_to_hsv
+
+PROJECT_ROOT = Path(__file__).parent.parent
+INDEX_FILE = PROJECT_ROOT / ".build_cache" / "hue_index.json"
+
+# Directories indexed by default
+ROOTS = [
+    PROJECT_ROOT / "theme_source",
+    PROJECT_ROOT / "build",
+]
+
+HUE_BINS = 36   # 10 degrees each
+SAT_BINS = 10   # 0.1 each
+
+# Bump when the histogram layout changes
+INDEX_VERSION = 2
+
+# Slack for float rounding at bin edges; keeps queries conservative
+EPSILON = 1e-9
+
+
+def histogram(img):
+    """
+    Sparse hue/saturation histogram of an image's opaque pixels.
+
+    Returns:
+        List of [bin, count] pairs, bin = hue_bin * SAT_BINS + sat_bin
+    """
+    rgba = np.asarray(img.convert('RGBA'))
+    opaque = rgba[rgba[..., 3] >= MIN_ALPHA]
+    if not len(opaque):
+        return []
+
+    h, s, _ = rgb_to_hsv(opaque[:, :3].astype(np.float64) / 255)
+    hue_bin = np.minimum((h * HUE_BINS).astype(np.int64), HUE_BINS - 1)
+    sat_bin = np.minimum((s * SAT_BINS).astype(np.int64), SAT_BINS - 1)
+    counts = np.bincount(hue_bin * SAT_BINS + sat_bin, minlength=HUE_BINS * SAT_BINS)
+    return [[int(b), int(counts[b])] for b in np.flatnonzero(counts)]
+
+
+def may_match(hist, hue_min, hue_max, min_saturation):
+    """
+    Whether a histogram may contain pixels a hue-window rule applies to.
+
+    Args:
+        hist: Sparse histogram from histogram()
+        hue_min, hue_max: Hue window, normalized 0-1 (inclusive)
+        min_saturation: Saturation floor, 0-1
+    """
+    for b, _ in hist:
+        hue_bin, sat_bin = divmod(b, SAT_BINS)
+        hue_lo = hue_bin / HUE_BINS
+        hue_hi = (hue_bin + 1) / HUE_BINS
+        sat_hi = (sat_bin + 1) / SAT_BINS
+        if (hue_lo <= hue_max + EPSILON and hue_hi >= hue_min - EPSILON
+                and sat_hi >= min_saturation - EPSILON):
+            return True
+    return False
+
+
+def _key(path):
+    """Project-relative path used in the index."""
+    path = Path(path).absolute()
+    try:
+        return path.relative_to(PROJECT_ROOT).as_posix()
+    except ValueError:
+        return str(path)
+
+
+class HueIndex:
+    """Content-hash keyed histogram index, loaded from and saved to disk."""
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = Path(path)
+        self.files = {}       # project-relative path -> sha256
+        self.histograms = {}  # sha256 -> sparse histogram
+        self.decoded = 0
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION or data.get("bins") != [HUE_BINS, SAT_BINS]:
+            return
+        self.files = data.get("files", {})
+        self.histograms = data.get("histograms", {})
+
+    def lookup(self, path):
+        """
+        Histogram of a file, computed only if its content is new.
+
+        Returns:
+            Sparse histogram, or None if the file cannot be read
+        """
+        key = _key(path)
+        digest = catalog().digest(path)
+        if digest is None:
+            if self.files.pop(key, None) is not None:
+                self._dirty = True
+            return None
+        if self.files.get(key) != digest:
+            self.files[key] = digest
+            self._dirty = True
+
+        hist = self.histograms.get(digest)
+        if hist is None:
+            try:
+                hist = histogram(decode(path, digest))
+            except OSError:
+                return None
+            self.histograms[digest] = hist
+            self.decoded += 1
+            self._dirty = True
+        return hist
+
+    def may_match(self, path, hue_min, hue_max, min_saturation):
+        """Conservative query for one file; unreadable files always match."""
+        hist = self.lookup(path)
+        if hist is None:
+            return True
+        return may_match(hist, hue_min, hue_max, min_saturation)
+
+    def query(self, paths, hue_min, hue_max, min_saturation):
+        """Paths that may contain pixels in the hue window."""
+        return [p for p in paths if self.may_match(p, hue_min, hue_max, min_saturation)]
+
+    def refresh(self, roots=None):
+        """Index every PNG under roots (default: ROOTS), dropping vanished files."""
+        roots = roots or ROOTS
+        catalog().refresh(*roots)
+        seen = set()
+        for root in roots:
+            for asset in catalog().find(under=root):
+                if asset.name.lower().endswith(".png"):
+                    seen.add(_key(asset.path))
+                    self.lookup(asset.path)
+
+        scanned = [_key(root) for root in roots]
+        for key in list(self.files):
+            inside = any(key == r or key.startswith(r + "/") for r in scanned)
+            if inside and key not in seen:
+                del self.files[key]
+                self._dirty = True
+        return len(seen)
+
+    def save(self):
+        """Write the index if it changed, dropping histograms no file refers to."""
+        if not self._dirty:
+            return
+        live = set(self.files.values())
+        self.histograms = {d: h for d, h in self.histograms.items() if d in live}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "bins": [HUE_BINS, SAT_BINS],
+                "files": self.files,
+                "histograms": self.histograms,
+            }, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hue/saturation histogram index")
+    parser.add_argument(
+        "--query", nargs=3, type=float, metavar=("HUE_MIN", "HUE_MAX", "MIN_SAT"),
+        help="List indexed files with pixels in a hue window (degrees) above a saturation",
+    )
+    parser.add_argument("--rebuild", action="store_true", help="Discard the index first")
+    args = parser.parse_args()
+
+    if args.rebuild and INDEX_FILE.exists():
+        INDEX_FILE.unlink()
+
+    index = HueIndex()
+    count = index.refresh()
+    index.save()
+    catalog().save()
+    print(f"✓ Indexed {count} files ({index.decoded} decoded, "
+          f"{len(index.histograms)} distinct images)")
+
+    if args.query:
+        hue_min, hue_max, min_sat = args.query
+        matches = index.query(
+            [PROJECT_ROOT / key for key in sorted(index.files)],
+            hue_min / 360, hue_max / 360, min_sat,
+        )
+        for path in matches:
+            print(f"  {_key(path)}")
+        print(f"✓ {len(matches)} files may match")
+
+
+if __name__ == "__main__":
+    main()
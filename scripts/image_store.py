@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+In-process store of build images shared between stages.
+
+Entries are keyed by archive name (the path relative to build/, e.g.
+"Default_7.0_DarkMinimal_unpacked/200/transport_play.png", which is
+also the member name in the .ReaperThemeZip). An entry holds a decoded
+RGBA image and/or its encoded bytes, plus a dirty flag:
+
+    clean   the file on disk is current; the image is only a decoded copy
+    dirty   a stage changed it; the store is the only up-to-date copy
+
+Stages get() images (decoded from disk on first use) and put() results
+back instead of saving PNGs. Dirty images are PNG-encoded once, the first
+time their bytes are needed (build cache or packaging), and flush()
+writes them to disk after packaging. Identical images put under several
+names are encoded once.
+
+Decoded images are counted against a memory budget; when it is exceeded
+the least recently used entries that can be re-created without
+re-rendering (clean ones, or dirty ones already encoded) drop their
+decoded pixels. Dirty unencoded images are never spilled.
+
+A store is opt-in: build_all.py --image-store activates one for the
+duration of the build, and stages fall back to plain files when
+active_store() is None.
+
+With sources, clean entries are backed by the source theme instead of
+build/ (e.g. "Default_7.0_DarkMinimal_unpacked" -> theme_source/
+Default_7.0_unpacked). build_all.py --stream uses this to package
+straight from memory: nothing is flushed and build/ is never created.
+"""
+
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from PIL import Image
+
+from build_fs import prepare_write
+from build_profile import encode_png
+from decode_cache import decode
+from parallel import default_memory_budget
+import tracing
+
+PROJECT_ROOT = Path(__file__).parent.parent
+BUILD_ROOT = PROJECT_ROOT / "build"
+
+
+class _Entry:
+    __slots__ = ("image", "data", "dirty")
+
+    def __init__(self, image=None, data=None, dirty=False):
+        self.image = image
+        self.data = data
+        self.dirty = dirty
+
+
+class ImageStore:
+    """Decoded build images keyed by archive name, with dirty tracking."""
+
+    def __init__(self, root=BUILD_ROOT, memory_budget=None, sources=None):
+        """
+        Args:
+            root: Directory archive names are relative to
+            memory_budget: Max decoded bytes held (default: BUILD_MEMORY_BUDGET_MB)
+            sources: {top-level name: path} backing clean entries instead
+                of root (default: none, clean entries are read from root)
+        """
+        self.root = Path(root)
+        self.sources = {name: Path(path) for name, path in (sources or {}).items()}
+        self.memory_budget = memory_budget or default_memory_budget()
+        self._entries = OrderedDict()  # name -> _Entry, least recently used first
+        self._encoded = {}             # id(image) -> (image, PNG bytes)
+        self._lock = threading.RLock()
+        self.decoded_bytes = 0
+        self.encodes = 0
+        self.spilled = 0
+
+    # -- names -----------------------------------------------------------
+
+    def name_for(self, path):
+        """Archive name of a Path under root; str names pass through unchanged."""
+        if isinstance(path, str):
+            return path
+        return Path(os.path.relpath(path, self.root)).as_posix()
+
+    def covers(self, path):
+        """Whether a Path lies under the store's root."""
+        return not os.path.relpath(path, self.root).startswith(os.pardir)
+
+    def path_for(self, name):
+        """File that backs a clean entry."""
+        top, _, rest = name.partition("/")
+        source = self.sources.get(top)
+        if source is not None:
+            return source / rest if rest else source
+        return self.root / name
+
+    # -- access ----------------------------------------------------------
+
+    def _touch(self, name):
+        entry = self._entries.get(name)
+        if entry is None:
+            entry = self._entries[name] = _Entry()
+        self._entries.move_to_end(name)
+        return entry
+
+    @staticmethod
+    def _size(image):
+        return image.width * image.height * len(image.getbands()) if image else 0
+
+    def _set_image(self, entry, image):
+        self.decoded_bytes += self._size(image) - self._size(entry.image)
+        entry.image = image
+
+    def __contains__(self, path):
+        with self._lock:
+            return self.name_for(path) in self._entries
+
+    def is_dirty(self, path):
+        """Whether the store holds a newer version of path than the disk."""
+        with self._lock:
+            entry = self._entries.get(self.name_for(path))
+            return bool(entry and entry.dirty)
+
+    def get(self, path):
+        """
+        RGBA image for path, decoded from the store's bytes or the backing
+        file on first use.
+        """
+        name = self.name_for(path)
+        with self._lock:
+            entry = self._touch(name)
+            if entry.image is None:
+                if entry.data is not None:
+                    with Image.open(io.BytesIO(entry.data)) as img:
+                        self._set_image(entry, img.convert('RGBA'))
+                else:
+                    self._set_image(entry, decode(self.path_for(name)).convert('RGBA'))
+                self._spill()
+            return entry.image
+
+    def put(self, path, image):
+        """Replace an image; it is encoded when its bytes are first needed."""
+        name = self.name_for(path)
+        with self._lock:
+            entry = self._touch(name)
+            self._set_image(entry, image)
+            entry.data = None
+            entry.dirty = True
+            self._spill()
+
+    def put_bytes(self, path, data):
+        """Replace a file with already-encoded bytes (no decode)."""
+        name = self.name_for(path)
+        with self._lock:
+            entry = self._touch(name)
+            self._set_image(entry, None)
+            entry.data = data
+            entry.dirty = True
+
+    def read_bytes(self, path):
+        """
+        Current bytes of path: dirty images are PNG-encoded (once), clean
+        entries are read from the backing file.
+        """
+        name = self.name_for(path)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or not entry.dirty:
+                return self.path_for(name).read_bytes()
+            if entry.data is None:
+                entry.data = self._encode(entry.image)
+            return entry.data
+
+    def _encode(self, image):
+        cached = self._encoded.get(id(image))
+        if cached is not None and cached[0] is image:
+            return cached[1]
+        data = encode_png(image)
+        self._encoded[id(image)] = (image, data)
+        self.encodes += 1
+        return data
+
+    def discard(self, path):
+        """Forget an entry, so it is read from its backing file again."""
+        name = self.name_for(path)
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is not None:
+                self._set_image(entry, None)
+
+    def dirty_names(self):
+        """Names of entries that differ from the disk, sorted."""
+        with self._lock:
+            return sorted(name for name, entry in self._entries.items() if entry.dirty)
+
+    # -- memory ----------------------------------------------------------
+
+    def _spill(self):
+        """Drop decoded pixels of re-creatable entries, least recently used first."""
+        if self.decoded_bytes <= self.memory_budget:
+            return
+        for entry in self._entries.values():
+            if self.decoded_bytes <= self.memory_budget:
+                break
+            if entry.image is not None and (not entry.dirty or entry.data is not None):
+                self._set_image(entry, None)
+                self.spilled += 1
+
+    # -- persistence -----------------------------------------------------
+
+    def flush(self):
+        """
+        Write dirty entries under root and mark them clean.
+
+        Returns:
+            Number of files written
+        """
+        with self._lock:
+            names = self.dirty_names()
+            for name in names:
+                data = self.read_bytes(name)
+                path = self.root / name
+                path.parent.mkdir(parents=True, exist_ok=True)
+                prepare_write(path)
+                path.write_bytes(data)
+                entry = self._entries[name]
+                entry.dirty = False
+                entry.data = None
+            self._encoded.clear()
+            return len(names)
+
+
+_active = None
+
+
+def active_store():
+    """The store of the running build, or None when stages use plain files."""
+    return _active
+
+
+def use_store(store):
+    """Activate a store for the stages of this process (None deactivates)."""
+    global _active
+    _active = store
+
+
+def read_file(path):
+    """Bytes of a build file, from the active store if it covers path."""
+    with tracing.file_span(path):
+        store = active_store()
+        if store is not None and store.covers(path):
+            data = store.read_bytes(Path(path))
+        else:
+            data = Path(path).read_bytes()
+        tracing.add(bytes_read=len(data))
+        return data
+
+
+def write_file(path, data):
+    """Replace a build file, in the active store if it covers path."""
+    with tracing.file_span(path):
+        tracing.add(files=1, bytes_written=len(data))
+        store = active_store()
+        if store is not None and store.covers(path):
+            store.put_bytes(Path(path), data)
+            return
+        prepare_write(path)
+        Path(path).write_bytes(data)
+
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Lossless PNG optimization for the packaged theme.
+
+Each PNG is re-encoded in every smaller form its pixels allow:
+
+    palette     <= 256 distinct RGBA colors -> indexed color with a tRNS
+                table, packed to 1/2/4 bits when the palette is small enough
+    gray        R == G == B everywhere -> L, or LA if any pixel is translucent
+    RGB         fully opaque -> alpha channel dropped
+    RGBA        the original layout, re-encoded
+
+and each form with several zlib strategies at level 9. The smallest
+candidate that decodes to exactly the same RGBA pixels as the original
+wins; if none beats the original bytes, they are kept. Ancillary chunks
+(text, gamma, ICC) are not carried over.
+
+Pillow does not expose the per-row PNG filter choice, so the filter
+search is limited to what its encoder does for each mode; the zlib
+strategy is what varies.
+
+Results are cached in .build_cache/optimized/, keyed by the content
+hash of the input, so each distinct image is optimized once per machine.
+A result's mtime is its LRU clock, and the least recently used results
+are evicted once the cache passes BUILD_OPTIMIZED_CACHE_MAX_MB (0
+disables the cache).
+build_theme.create_zip runs this over the archive members when the
+build profile asks for it (release); it can also be run on a tree:
+
+    python scripts/optimize_pngs.py                   # report on build/
+    python scripts/optimize_pngs.py theme_source --jobs 1
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import posixpath
+import zlib
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from asset_catalog import catalog
+from parallel import add_parallel_arguments, parallel_options, run_parallel
+
+PROJECT_ROOT = Path(__file__).parent.parent
+OPTIMIZED_DIR = PROJECT_ROOT / ".build_cache" / "optimized"
+
+# Default total size cap for cached results
+DEFAULT_MAX_SIZE_MB = 64
+
+# Bump when the candidate set changes, so cached results are recomputed
+OPTIMIZER_VERSION = 1
+
+# zlib strategies tried for every candidate layout
+STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED, zlib.Z_RLE)
+
+
+def _palette_image(rgba):
+    """
+    Indexed copy of an RGBA array with <= 256 colors, else None.
+
+    Translucent entries come first so the tRNS table can stop at the last
+    one; save options carry the bit depth and the transparency table.
+    """
+    packed = rgba.reshape(-1, 4).view(np.uint32).ravel()
+    colors, indices = np.unique(packed, return_inverse=True)
+    if len(colors) > 256:
+        return None
+
+    entries = colors.view(np.uint8).reshape(-1, 4)
+    order = np.argsort(entries[:, 3] == 255, kind="stable")
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    entries = entries[order]
+
+    height, width = rgba.shape[:2]
+    image = Image.fromarray(remap[indices].astype(np.uint8).reshape(height, width), "P")
+    image.putpalette(entries[:, :3].tobytes())
+
+    options = {}
+    translucent = int(np.count_nonzero(entries[:, 3] < 255))
+    if translucent:
+        options["transparency"] = entries[:translucent, 3].tobytes()
+    count = len(entries)
+    options["bits"] = 1 if count <= 2 else 2 if count <= 4 else 4 if count <= 16 else 8
+    return image, options
+
+
+def candidates(img):
+    """(image, save options) for every lossless layout of img's pixels."""
+    rgba_image = img.convert("RGBA")
+    rgba = np.asarray(rgba_image)
+    opaque = bool((rgba[..., 3] == 255).all())
+    gray = bool((rgba[..., 0] == rgba[..., 1]).all() and (rgba[..., 1] == rgba[..., 2]).all())
+
+    forms = [(rgba_image, {})]
+    if gray:
+        forms.append((rgba_image.convert("L" if opaque else "LA"), {}))
+    elif opaque:
+        forms.append((rgba_image.convert("RGB"), {}))
+    palette = _palette_image(rgba)
+    if palette is not None:
+        forms.append(palette)
+    return rgba_image, forms
+
+
+def optimize_bytes(data):
+    """
+    Smallest lossless encoding of a PNG.
+
+    Returns:
+        Optimized bytes, or None if the original is already the smallest
+        (or is not a PNG Pillow can read)
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+            reference, forms = candidates(img)
+    except (OSError, ValueError):
+        return None
+    expected = reference.tobytes()
+
+    best = None
+    for image, options in forms:
+        for strategy in STRATEGIES:
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG", compress_level=9, compress_type=strategy, **options)
+            encoded = buffer.getvalue()
+            if len(encoded) >= len(best if best is not None else data):
+                continue
+            with Image.open(io.BytesIO(encoded)) as check:
+                if check.convert("RGBA").tobytes() != expected:
+                    continue
+            best = encoded
+    return best
+
+
+def default_max_bytes():
+    """Size cap in bytes from BUILD_OPTIMIZED_CACHE_MAX_MB, else the default."""
+    mb = int(os.environ.get("BUILD_OPTIMIZED_CACHE_MAX_MB", DEFAULT_MAX_SIZE_MB))
+    return mb * 1024 * 1024
+
+
+def _cache_path(digest):
+    return OPTIMIZED_DIR / f"{digest}-v{OPTIMIZER_VERSION}.png"
+
+
+def _lookup(digest):
+    """Cached result: optimized bytes, b"" if the original wins, None on a miss."""
+    path = _cache_path(digest)
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+
+def _remember(digest, result):
+    """Cache a result (an empty file means keep the original)."""
+    path = _cache_path(digest)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(result or b"")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def evict(max_bytes=None):
+    """
+    Drop least recently used results until the cache is under max_bytes
+    (default: BUILD_OPTIMIZED_CACHE_MAX_MB).
+
+    Returns:
+        Number of results removed
+    """
+    max_bytes = default_max_bytes() if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    try:
+        scanned = list(os.scandir(OPTIMIZED_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in scanned:
+        if not entry.name.endswith(".png"):
+            continue
+        try:
+            st = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        total += st.st_size
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def _optimize_task(source):
+    """Worker: optimized bytes of a path or in-memory PNG, or None."""
+    data = source if isinstance(source, (bytes, bytearray)) else Path(source).read_bytes()
+    return optimize_bytes(data)
+
+
+def _digest(source):
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    return catalog().digest(source)
+
+
+def optimize_members(files, jobs=None, memory_budget=None):
+    """
+    Replace PNG members by their smallest lossless encoding.
+
+    Args:
+        files: List of (archive name, path or bytes), as for theme_zip
+        jobs, memory_budget: See parallel.run_parallel
+
+    Returns:
+        (files, report) with optimized members as bytes and report mapping
+        each archive directory to (files optimized, bytes before, bytes after)
+    """
+    cache = default_max_bytes() > 0
+    results = {}
+    pending = []
+    for index, (name, source) in enumerate(files):
+        if not name.lower().endswith(".png"):
+            continue
+        digest = _digest(source) if cache else None
+        cached = _lookup(digest) if digest else None
+        if cached is not None:
+            results[index] = cached or None
+        else:
+            pending.append((index, digest, source))
+
+    computed = run_parallel(
+        _optimize_task, [source for _, _, source in pending],
+        jobs=jobs, memory_budget=memory_budget,
+    )
+    for (index, digest, _), result in zip(pending, computed):
+        if digest:
+            _remember(digest, result)
+        results[index] = result
+    if cache and pending:
+        evict()
+
+    report = defaultdict(lambda: [0, 0, 0])
+    optimized = list(files)
+    for index, result in results.items():
+        name, source = files[index]
+        original = len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source)
+        stats = report[posixpath.dirname(name)]
+        stats[1] += original
+        if result is None:
+            stats[2] += original
+            continue
+        stats[0] += 1
+        stats[2] += len(result)
+        optimized[index] = (name, result)
+    return optimized, {folder: tuple(stats) for folder, stats in sorted(report.items())}
+
+
+def print_report(report):
+    """Print bytes saved per archive directory."""
+    total_before = sum(before for _, before, _ in report.values())
+    total_after = sum(after for _, _, after in report.values())
+    for folder, (count, before, after) in report.items():
+        saved = before - after
+        print(f"    {folder or '.'}: {count} optimized, {saved / 1024:.1f} KB saved "
+              f"({100 * saved / before if before else 0:.1f}%)")
+    saved = total_before - total_after
+    print(f"  ✓ PNGs: {total_before / 1024:.0f} KB -> {total_after / 1024:.0f} KB "
+          f"({saved / 1024:.1f} KB saved)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report lossless PNG savings for a tree")
+    parser.add_argument("root", nargs="?", type=Path, default=PROJECT_ROOT / "build",
+                        help="Directory to scan (default: build/)")
+    parser.add_argument("--write", action="store_true",
+                        help="Rewrite the files in place instead of only reporting")
+    add_parallel_arguments(parser)
+    args = parser.parse_args()
+
+    root = args.root.absolute()
+    files = [
+        (Path(os.path.relpath(asset.path, root)).as_posix(), asset.path)
+        for asset in catalog().find("*.png", under=root)
+    ]
+    if not files:
+        print(f"⊗ No PNGs under {args.root}")
+        return
+
+    optimized, report = optimize_members(files, **parallel_options(args))
+    print_report(report)
+    if args.write:
+        from build_fs import prepare_write
+
+        for (_, path), (_, result) in zip(files, optimized):
+            if isinstance(result, bytes):
+                prepare_write(path)
+                Path(path).write_bytes(result)
+    catalog().save()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Process-pool executor shared by the image stages.
+
+Spreads independent per-file (or per-file, per-DPI) work across a
+ProcessPoolExecutor while capping how many decoded bytes are in flight.
+Results always come back in input order, so logs and outputs are
+deterministic no matter which worker finishes first. With jobs=1 the
+work runs serially in-process.
+
+Stages expose this as --jobs / --memory-budget; build_all.py forwards
+its own settings through the BUILD_JOBS and BUILD_MEMORY_BUDGET_MB
+environment variables.
+
+Workers are started with forkserver (spawn where that is unavailable),
+never by forking the build: stages run on threads, and a fork taken while
+another thread holds a lock would inherit it locked. Workers therefore
+inherit nothing from the build process implicitly. Each one is given the
+build's BUILD_* settings (profile, cache options) when it starts, and
+anything else travels with the work item (capture flags, trace origin).
+BUILD_START_METHOD=spawn forces spawn, e.g. to test the macOS/Windows path.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from PIL import Image
+
+from asset_catalog import catalog
+import tracing
+
+# Default cap on decoded image bytes being processed at once
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+# Worker start methods that do not fork the (multithreaded) build process
+START_METHODS = ("forkserver", "spawn")
+
+# Imported once by the fork server, so its workers start with them loaded
+FORKSERVER_PRELOAD = ["numpy", "PIL.Image"]
+
+
+def default_jobs():
+    """Worker count from BUILD_JOBS, else one per CPU."""
+    env = os.environ.get("BUILD_JOBS")
+    if env:
+        return max(1, int(env))
+    return os.cpu_count() or 1
+
+
+def default_memory_budget():
+    """Memory budget in bytes from BUILD_MEMORY_BUDGET_MB, else the default."""
+    mb = int(os.environ.get("BUILD_MEMORY_BUDGET_MB", DEFAULT_MEMORY_BUDGET_MB))
+    return mb * 1024 * 1024
+
+
+def add_parallel_arguments(parser):
+    """Add --jobs and --memory-budget options to an argparse parser."""
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=None,
+        help="Worker processes (default: BUILD_JOBS or CPU count; 1 = serial)",
+    )
+    parser.add_argument(
+        "--memory-budget", type=int, default=None, metavar="MB",
+        help=f"Max decoded image MB in flight (default: {DEFAULT_MEMORY_BUDGET_MB})",
+    )
+
+
+def parallel_options(args):
+    """Turn parsed --jobs / --memory-budget into run_parallel() keywords."""
+    budget = args.memory_budget * 1024 * 1024 if args.memory_budget else None
+    return {"jobs": args.jobs, "memory_budget": budget}
+
+
+def worker_context():
+    """
+    Multiprocessing context for worker pools: BUILD_START_METHOD if set,
+    else forkserver where available, else spawn.
+    """
+    method = os.environ.get("BUILD_START_METHOD")
+    if method is None:
+        available = multiprocessing.get_all_start_methods()
+        method = "forkserver" if "forkserver" in available else "spawn"
+    if method not in START_METHODS:
+        raise ValueError(
+            f"Unknown BUILD_START_METHOD '{method}' (expected one of: {', '.join(START_METHODS)})"
+        )
+    context = multiprocessing.get_context(method)
+    if method == "forkserver":
+        context.set_forkserver_preload(FORKSERVER_PRELOAD)
+    return context
+
+
+def _worker_settings():
+    """The BUILD_* environment a worker is started with."""
+    return {key: value for key, value in os.environ.items() if key.startswith("BUILD_")}
+
+
+def _init_worker(settings):
+    """Pool initializer: apply the build's settings, dropping stale ones."""
+    for key in [key for key in os.environ if key.startswith("BUILD_")]:
+        if key not in settings:
+            del os.environ[key]
+    os.environ.update(settings)
+
+
+def decoded_size(path):
+    """Estimate decoded RGBA bytes for an image from its header only."""
+    info = catalog().image_info(path)
+    if info:
+        return info[0] * info[1] * 4
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+    except (OSError, ValueError):
+        return 0
+    return width * height * 4
+
+
+def run_parallel(func, items, jobs=None, cost=None, memory_budget=None):
+    """
+    Run func(item) for every item and return the results in input order.
+
+    Args:
+        func: Picklable module-level function taking one item
+        items: Iterable of picklable work items
+        jobs: Worker processes (None = default_jobs(), 1 = serial)
+        cost: Optional function item -> estimated decoded bytes
+        memory_budget: Max summed cost in flight, in bytes (None = default)
+
+    A single item larger than the budget still runs, just on its own.
+    """
+    items = list(items)
+    jobs = jobs or default_jobs()
+    jobs = min(jobs, len(items)) if items else 1
+
+    if jobs <= 1:
+        return [func(item) for item in items]
+
+    # Traced workers send their spans back with each result
+    tracer = tracing.active_tracer()
+
+    budget = memory_budget or default_memory_budget()
+    costs = [cost(item) if cost else 0 for item in items]
+    results = [None] * len(items)
+
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=worker_context(),
+                             initializer=_init_worker,
+                             initargs=(_worker_settings(),)) as pool:
+        pending = {}
+        in_flight = 0
+        next_index = 0
+
+        while next_index < len(items) or pending:
+            # Fill the pool while there is room in the worker and memory budget
+            while next_index < len(items) and len(pending) < jobs * 2:
+                item_cost = costs[next_index]
+                if pending and in_flight + item_cost > budget:
+                    break
+                if tracer is not None:
+                    future = pool.submit(tracing.call_traced, func, items[next_index],
+                                         tracer.origin)
+                else:
+                    future = pool.submit(func, items[next_index])
+                pending[future] = next_index
+                in_flight += item_cost
+                next_index += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                in_flight -= costs[index]
+                results[index] = future.result()
+                if tracer is not None:
+                    results[index], events = results[index]
+                    tracer.merge(events)
+
+    return results
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+In-process DAG scheduler for the build stages.
+
+Each stage declares the paths it reads and writes (files, directories or
+glob patterns). A stage depends on every earlier stage whose outputs it
+reads or writes, or whose inputs it overwrites; stages with no such
+relation run concurrently on a thread pool. Among the stages that are
+ready, the ones that took longest in previous builds start first.
+
+Stage output is buffered per thread and printed as one block when the
+stage finishes, so concurrent stages do not interleave their logs.
+Per-stage wall times are kept in .build_cache/stage_times.json. When
+tracing is on (tracing.py), each stage runs inside a "stage" span, and
+under the profilers too if the tracer has a profile directory.
+"""
+
+import fnmatch
+import io
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import tracing
+
+PROJECT_ROOT = Path(__file__).parent.parent
+TIMES_FILE = PROJECT_ROOT / ".build_cache" / "stage_times.json"
+
+# How many past runs to average for a stage's expected duration
+HISTORY_LENGTH = 5
+
+
+class Stage:
+    """A build step with declared inputs and outputs."""
+
+    def __init__(self, name, func, description, inputs=(), outputs=()):
+        """
+        Args:
+            name: Short unique stage name
+            func: Callable run with no arguments
+            description: Banner text
+            inputs: Paths or glob patterns the stage reads
+            outputs: Paths or glob patterns the stage writes
+        """
+        self.name = name
+        self.func = func
+        self.description = description
+        self.inputs = [os.path.abspath(p) for p in inputs]
+        self.outputs = [os.path.abspath(p) for p in outputs]
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+def paths_overlap(a, b):
+    """True if two paths/patterns can refer to the same file."""
+    if a == b:
+        return True
+    # Directory containment
+    if a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep):
+        return True
+    # Glob patterns
+    return fnmatch.fnmatchcase(a, b) or fnmatch.fnmatchcase(b, a)
+
+
+def _any_overlap(paths_a, paths_b):
+    return any(paths_overlap(a, b) for a in paths_a for b in paths_b)
+
+
+def dependencies(stages):
+    """
+    Derive the dependency graph from declared inputs and outputs.
+
+    Returns:
+        Dict of stage name -> set of stage names it must wait for
+    """
+    deps = {stage.name: set() for stage in stages}
+    for i, later in enumerate(stages):
+        for earlier in stages[:i]:
+            if (
+                _any_overlap(later.inputs, earlier.outputs)      # read after write
+                or _any_overlap(later.outputs, earlier.outputs)  # write after write
+                or _any_overlap(later.outputs, earlier.inputs)   # write after read
+            ):
+                deps[later.name].add(earlier.name)
+    return deps
+
+
+def load_times(path=TIMES_FILE):
+    """Load per-stage duration history."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_times(times, path=TIMES_FILE):
+    """Persist per-stage duration history (skipped on a read-only checkout)."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, 'w') as f:
+            json.dump(times, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def expected_duration(times, name):
+    """Average of recent durations, 0 for a stage never run before."""
+    history = times.get(name) or [0.0]
+    return sum(history) / len(history)
+
+
+class _ThreadOutput(io.TextIOBase):
+    """stdout proxy that routes writes to a per-thread buffer when one is set."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self):
+        self.local.buffer = io.StringIO()
+
+    def release(self):
+        buffer = getattr(self.local, "buffer", None)
+        self.local.buffer = None
+        return buffer.getvalue() if buffer else ""
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is not None:
+            return buffer.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _banner(stage):
+    return f"\n{'─' * 50}\n▶ {stage.description}\n{'─' * 50}\n"
+
+
+def run_stages(stages, max_workers=None, times_path=TIMES_FILE):
+    """
+    Run stages in dependency order, independent ones concurrently.
+
+    Returns:
+        (ok, durations) where durations maps stage name -> seconds
+    """
+    deps = dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    times = load_times(times_path)
+
+    done = set()
+    failed = set()
+    durations = {}
+
+    output = _ThreadOutput(sys.stdout)
+    real_stdout = sys.stdout
+    sys.stdout = output
+
+    def execute(stage):
+        output.capture()
+        start = time.perf_counter()
+        try:
+            with tracing.span(stage.name, "stage"), tracing.profile(stage.name):
+                stage.func()
+            ok = True
+        except Exception:
+            traceback.print_exc(file=sys.stdout)
+            ok = False
+        except BaseException:
+            # Ctrl+C / SystemExit end the build: show what the stage logged, then propagate
+            real_stdout.write(_banner(stage) + output.release())
+            raise
+        elapsed = time.perf_counter() - start
+        return ok, elapsed, output.release()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1) as pool:
+            running = {}
+            remaining = list(stages)
+
+            while remaining or running:
+                # Skip stages whose dependencies failed
+                for stage in list(remaining):
+                    if deps[stage.name] & failed:
+                        remaining.remove(stage)
+                        failed.add(stage.name)
+                        real_stdout.write(f"\n  ⊘ Skipping {stage.name} (dependency failed)\n")
+
+                ready = [s for s in remaining if deps[s.name] <= done]
+                ready.sort(key=lambda s: expected_duration(times, s.name), reverse=True)
+                for stage in ready:
+                    remaining.remove(stage)
+                    running[pool.submit(execute, stage)] = stage
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    ok, elapsed, log = future.result()
+                    durations[stage.name] = elapsed
+
+                    real_stdout.write(_banner(stage) + log)
+                    if ok:
+                        done.add(stage.name)
+                        history = times.get(stage.name, [])[-(HISTORY_LENGTH - 1):]
+                        times[stage.name] = history + [round(elapsed, 4)]
+                    else:
+                        failed.add(stage.name)
+                        real_stdout.write(f"  ✗ {stage.name} failed!\n")
+                    real_stdout.flush()
+    finally:
+        sys.stdout = real_stdout
+
+    save_times(times, times_path)
+    return not failed and len(done) == len(by_name), durations
+
+
+def print_timings(durations):
+    """Print a per-stage timing summary, slowest first."""
+    if not durations:
+        return
+    width = max(len(name) for name in durations)
+    print("\nStage timings:")
+    for name, seconds in sorted(durations.items(), key=lambda kv: -kv[1]):
+        print(f"  {name:<{width}}  {seconds * 1000:8.1f} ms")
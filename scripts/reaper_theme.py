@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Model of a .ReaperTheme file.
+
+A .ReaperTheme is an INI-style file with a [color theme] section
+(col_*=<int> colors and *_mode flags) and a [REAPER] section (fonts and
+other settings). ReaperTheme parses it once into an ordered key index:
+lookups and edits are dict operations, and untouched lines (comments,
+blank lines, ordering, line endings) are written back verbatim.
+"""
+
+from pathlib import Path
+
+COLOR_SECTION = "color theme"
+REAPER_SECTION = "REAPER"
+
+
+def hex_to_reaper(hex_color: str) -> int:
+    """Convert hex color (#RRGGBB) to REAPER RGB decimal format"""
+    hex_color = hex_color.lstrip('#')
+    r = int(hex_color[0:2], 16)
+    g = int(hex_color[2:4], 16)
+    b = int(hex_color[4:6], 16)
+    # REAPER uses RGB format: R + G*256 + B*65536
+    return r + (g * 256) + (b * 65536)
+
+
+def reaper_to_hex(reaper_color: int) -> str:
+    """Convert REAPER BGR decimal to hex color (#RRGGBB)"""
+    if reaper_color < 0:
+        # Handle negative values (alpha blending)
+        reaper_color = reaper_color & 0xFFFFFFFF
+    b = reaper_color % 256
+    g = (reaper_color // 256) % 256
+    r = (reaper_color // 65536) % 256
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _line_ending(line):
+    return line[len(line.rstrip("\r\n")):]
+
+
+class ReaperTheme:
+    """Parsed .ReaperTheme with an ordered (section, key) index."""
+
+    def __init__(self, text):
+        self.lines = text.splitlines(keepends=True)
+        self.sections = []
+        # (section, key) -> line numbers; a key repeated in a section keeps every line
+        self.index = {}
+
+        section = None
+        for number, line in enumerate(self.lines):
+            stripped = line.strip()
+            if stripped.startswith("[") and stripped.endswith("]"):
+                section = stripped[1:-1]
+                self.sections.append(section)
+            elif "=" in stripped and not stripped.startswith(";"):
+                key = stripped.split("=", 1)[0]
+                self.index.setdefault((section, key), []).append(number)
+
+    @classmethod
+    def load(cls, path):
+        """Parse a .ReaperTheme file."""
+        with open(path, 'r', newline='') as f:
+            return cls(f.read())
+
+    def __contains__(self, section_key):
+        return section_key in self.index
+
+    def keys(self, section):
+        """Keys of a section in file order."""
+        return [key for (sec, key) in self.index if sec == section]
+
+    def get(self, section, key, default=None):
+        """Value of key in section (first occurrence), or default."""
+        numbers = self.index.get((section, key))
+        if not numbers:
+            return default
+        return self.lines[numbers[0]].rstrip("\r\n").split("=", 1)[1]
+
+    def set(self, section, key, value):
+        """
+        Set an existing key. Every occurrence in the section is updated.
+
+        Returns:
+            False if the key does not exist (nothing is added)
+        """
+        numbers = self.index.get((section, key))
+        if not numbers:
+            return False
+        for number in numbers:
+            line = self.lines[number]
+            self.lines[number] = f"{key}={value}{_line_ending(line)}"
+        return True
+
+    def update(self, section, values):
+        """
+        Set several existing keys at once.
+
+        Returns:
+            List of keys that were not found in the section
+        """
+        return [key for key, value in values.items() if not self.set(section, key, value)]
+
+    def serialize(self):
+        """Render the theme back to text in one pass."""
+        return "".join(self.lines)
+
+    def save(self, path):
+        """Write the theme to path."""
+        with open(Path(path), 'w', newline='') as f:
+            f.write(self.serialize())
@@ -6,19 +6,24 @@ Converts green pixels (hue ~120°) to warm blue (hue ~205°)
 while preserving brightness and saturation.
 """
 
-from PIL import Image
+import argparse
 import colorsys
-from pathlib import Path
 
-BUILD_DIR = Path(__file__).parent.parent / "build" / "Default_7.0_DarkMinimal_unpacked"
+from build_cache import add_cache_arguments
+from parallel import add_parallel_arguments, parallel_options
+from recolor_rules import ROOTS, apply_rules, load_rules, run_rules, stage_cache
 
-# Target hue shift: green (120°) -> warm blue (205°)
-GREEN_HUE_MIN = 80 / 360   # ~80° in normalized 0-1 range
-GREEN_HUE_MAX = 160 / 360  # ~160° in normalized 0-1 range
-TARGET_BLUE_HUE = 205 / 360  # Warm blue ~205°
+BUILD_DIR = ROOTS["build"]
 
+# Target hue shift: green (120°) -> warm blue (205°), from recolor_rules.json
+RULE = load_rules()["green_to_blue"]
+GREEN_HUE_MIN = RULE.hue_min   # ~80° in normalized 0-1 range
+GREEN_HUE_MAX = RULE.hue_max   # ~160° in normalized 0-1 range
+TARGET_BLUE_HUE = RULE.target_hue  # Warm blue ~205°
+MIN_SATURATION = RULE.min_saturation
 
-def is_green_pixel(r, g, b, a, min_saturation=0.2):
+
+def is_green_pixel(r, g, b, a, min_saturation=MIN_SATURATION):
     """Check if a pixel is green (and not grayscale)."""
     if a < 10:  # Skip transparent pixels
         return False
@@ -30,14 +35,19 @@ def is_green_pixel(r, g, b, a, min_saturation=0.2):
 
 
 def shift_green_to_blue(r, g, b, a):
-    """Shift green pixel to warm blue while preserving saturation and value."""
+    """
+    Shift green pixel to warm blue while preserving saturation and value.
+
+    Per-pixel reference for recolor_kernel.shift_hue_array(), which must
+    produce identical output.
+    """
     if a < 10:  # Keep transparent pixels
         return (r, g, b, a)
 
     h, s, v = colorsys.rgb_to_hsv(r/255, g/255, b/255)
 
     # If it's in the green range, shift to blue
-    if GREEN_HUE_MIN <= h <= GREEN_HUE_MAX and s >= 0.2:
+    if GREEN_HUE_MIN <= h <= GREEN_HUE_MAX and s >= MIN_SATURATION:
         # Shift hue to warm blue
         new_r, new_g, new_b = colorsys.hsv_to_rgb(TARGET_BLUE_HUE, s, v)
         return (int(new_r * 255), int(new_g * 255), int(new_b * 255), a)
@@ -48,73 +58,25 @@ def shift_green_to_blue(r, g, b, a):
 def recolor_image(image_path):
     """Recolor green pixels in an image to warm blue."""
     try:
-        img = Image.open(image_path).convert('RGBA')
-        pixels = img.load()
-        width, height = img.size
-
-        modified = False
-        for y in range(height):
-            for x in range(width):
-                r, g, b, a = pixels[x, y]
-
-                if is_green_pixel(r, g, b, a):
-                    pixels[x, y] = shift_green_to_blue(r, g, b, a)
-                    modified = True
-
-        if modified:
-            img.save(image_path)
-            return True
-        return False
-
+        return bool(apply_rules(image_path, [RULE]))
     except Exception as e:
         print(f"  ✗ Error processing {image_path.name}: {e}")
         return False
 
 
-def recolor_all_icons():
+def recolor_all_icons(jobs=None, memory_budget=None, cache=None):
     """Recolor all green icons in the theme to warm blue."""
-
-    # Patterns to match - focus on UI icons, not transport (we have custom transport)
-    patterns = [
-        "*fx*.png",
-        "*expand*.png",
-        "*collapse*.png",
-        "*arrow*.png",
-        "gen_*.png",
-        "mcp_*.png",
-        "tcp_*.png",
-        "item_*.png",
-        "track_*.png",
-        "table_*.png",
-    ]
-
-    all_files = set()
-    for pattern in patterns:
-        all_files.update(BUILD_DIR.glob(pattern))
-        all_files.update((BUILD_DIR / "150").glob(pattern))
-        all_files.update((BUILD_DIR / "200").glob(pattern))
-
-    modified_count = 0
-    skipped_count = 0
-
-    for image_path in sorted(all_files):
-        # Skip our custom transport icons
-        if "transport_" in image_path.name:
-            continue
-
-        if recolor_image(image_path):
-            print(f"  ✓ {image_path.relative_to(BUILD_DIR)}")
-            modified_count += 1
-        else:
-            skipped_count += 1
-
-    print(f"\n✓ Recolored {modified_count} icons")
-    print(f"  Skipped: {skipped_count} (no green found)")
+    run_rules([RULE.name], jobs=jobs, memory_budget=memory_budget, cache=cache)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_parallel_arguments(parser)
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
     print("=" * 50)
     print("Green → Warm Blue Icon Recoloring")
     print("=" * 50)
-    recolor_all_icons()
+    recolor_all_icons(**parallel_options(args), cache=stage_cache(args))
     print("=" * 50)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Vectorized hue-shift kernel shared by the recolor scripts.
+
+Converts a whole RGBA image to HSV arrays, masks pixels by hue window,
+saturation floor and alpha, and writes the shifted colors back in one pass.
+The float math mirrors colorsys.rgb_to_hsv / hsv_to_rgb step for step
+(including the int() truncation), so the output is bit-identical to the
+per-pixel shift_green_to_blue() loops it replaces.
+"""
+
+import numpy as np
+from PIL import Image
+
+from build_fs import prepare_write
+from build_profile import save_png
+
+# Pixels with alpha below this are left untouched
+MIN_ALPHA = 10
+
+
+def rgb_to_hsv(rgb):
+    """
+    Convert an (..., 3) float array of 0-1 RGB values to h, s, v arrays.
+
+    Same operation order as colorsys.rgb_to_hsv.
+    """
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    rangec = maxc - minc
+    gray = rangec == 0
+
+    # Gray pixels have h = s = 0; keep the divisions away from zero for them
+    safe_range = np.where(gray, 1.0, rangec)
+    safe_max = np.where(gray, 1.0, maxc)
+
+    s = np.where(gray, 0.0, rangec / safe_max)
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+
+    h = np.select(
+        [r == maxc, g == maxc],
+        [bc - gc, 2.0 + rc - bc],
+        4.0 + gc - rc,
+    )
+    h = np.where(gray, 0.0, np.mod(h / 6.0, 1.0))
+    return h, s, maxc
+
+
+def hsv_to_rgb(h, s, v):
+    """
+    Convert a scalar hue plus s, v arrays to an (..., 3) float RGB array.
+
+    Same operation order as colorsys.hsv_to_rgb.
+    """
+    i = int(h * 6.0)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+
+    channels = {
+        0: (v, t, p),
+        1: (q, v, p),
+        2: (p, v, t),
+        3: (p, q, v),
+        4: (t, p, v),
+        5: (v, p, q),
+    }[i % 6]
+
+    rgb = np.stack(channels, axis=-1)
+    return np.where((s == 0.0)[..., None], v[..., None], rgb)
+
+
+def hue_mask(rgba, hue_min, hue_max, min_saturation):
+    """
+    Find the pixels a hue-window rule applies to.
+
+    Args:
+        rgba: uint8 array of shape (h, w, 4)
+        hue_min, hue_max: Hue window, normalized 0-1 (inclusive)
+        min_saturation: Minimum HSV saturation, 0-1
+
+    Returns:
+        (mask, s, v) where mask is a boolean (h, w) array
+    """
+    rgb = rgba[..., :3].astype(np.float64) / 255
+    h, s, v = rgb_to_hsv(rgb)
+    mask = (
+        (rgba[..., 3] >= MIN_ALPHA)
+        & (h >= hue_min) & (h <= hue_max)
+        & (s >= min_saturation)
+    )
+    return mask, s, v
+
+
+def shift_hue_array(rgba, hue_min, hue_max, min_saturation, target_hue):
+    """
+    Shift every matching pixel of an RGBA array to target_hue.
+
+    Saturation, value and alpha are preserved.
+
+    Returns:
+        (new_rgba, changed) where changed is the number of pixels that differ
+    """
+    mask, s, v = hue_mask(rgba, hue_min, hue_max, min_saturation)
+    if not mask.any():
+        return rgba, 0
+
+    shifted = (hsv_to_rgb(target_hue, s[mask], v[mask]) * 255).astype(np.uint8)
+
+    out = rgba.copy()
+    out[mask, :3] = shifted
+    changed = int(np.count_nonzero((out != rgba).any(axis=-1)))
+    return out, changed
+
+
+def shift_hue(img, hue_min, hue_max, min_saturation, target_hue):
+    """
+    Shift matching pixels of a PIL image to target_hue.
+
+    Returns:
+        (RGBA image, number of changed pixels)
+    """
+    rgba = np.asarray(img.convert('RGBA'))
+    out, changed = shift_hue_array(rgba, hue_min, hue_max, min_saturation, target_hue)
+    if not changed:
+        return img.convert('RGBA'), 0
+    return Image.fromarray(out), changed
+
+
+def recolor_file(image_path, hue_min, hue_max, min_saturation, target_hue):
+    """
+    Recolor a PNG in place.
+
+    Returns:
+        True if the image changed and was saved
+    """
+    img, changed = shift_hue(
+        Image.open(image_path), hue_min, hue_max, min_saturation, target_hue
+    )
+    if changed:
+        prepare_write(image_path)
+        save_png(img, image_path)
+        return True
+    return False
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Run the hue-window recolor rules from recolor_rules.json.
+
+Each rule lists file globs, DPI tiers, a hue window, a saturation floor
+and a target hue. The planner compiles the enabled rules into one entry
+per file, so a file matched by several rules is decoded once, has every
+matching rule applied in order, and is encoded once.
+
+Before decoding, the plan is checked against the hue histogram index
+(hue_index.py): files with no pixels in any of their rules' hue windows
+are skipped.
+
+Usage:
+    python scripts/recolor_rules.py              # all enabled rules
+    python scripts/recolor_rules.py io_icons     # selected rules only
+    python scripts/recolor_rules.py --list
+    python scripts/recolor_rules.py --jobs 1     # serial
+    python scripts/recolor_rules.py --no-index      # decode every matched file
+"""
+
+import argparse
+import fnmatch
+import json
+import sys
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+
+from PIL import Image
+
+from asset_catalog import catalog
+from build_cache import BuildCache, add_cache_arguments, run_cached
+from build_fs import prepare_write
+from build_profile import save_png
+from decode_cache import decode_cache
+from hue_index import HueIndex
+from parallel import add_parallel_arguments, decoded_size, parallel_options, run_parallel
+from recolor_kernel import shift_hue_array
+
+PROJECT_ROOT = Path(__file__).parent.parent
+RULES_FILE = PROJECT_ROOT / "recolor_rules.json"
+
+# Directories a rule's "root" can refer to
+ROOTS = {
+    "build": PROJECT_ROOT / "build" / "Default_7.0_DarkMinimal_unpacked",
+    "theme_source": PROJECT_ROOT / "theme_source" / "Default_7.0_unpacked",
+}
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A compiled recolor rule. Hues are normalized to 0-1."""
+    name: str
+    root: str
+    dpi: tuple
+    files: tuple
+    exclude: tuple
+    hue_min: float
+    hue_max: float
+    min_saturation: float
+    target_hue: float
+    enabled: bool = True
+
+    def matches(self, name):
+        """Check a file name against the rule's globs."""
+        if not any(fnmatch.fnmatchcase(name, p) for p in self.files):
+            return False
+        return not any(fnmatch.fnmatchcase(name, p) for p in self.exclude)
+
+
+def load_rules(path=RULES_FILE):
+    """Load recolor_rules.json into Rule objects, keeping file order."""
+    with open(path, 'r') as f:
+        raw = json.load(f)
+
+    rules = {}
+    for name, spec in raw.items():
+        hue_min, hue_max = spec["hue"]
+        rules[name] = Rule(
+            name=name,
+            root=spec["root"],
+            dpi=tuple(spec.get("dpi", [""])),
+            files=tuple(spec["files"]),
+            exclude=tuple(spec.get("exclude", [])),
+            hue_min=hue_min / 360,
+            hue_max=hue_max / 360,
+            min_saturation=spec["min_saturation"],
+            target_hue=spec["target_hue"] / 360,
+            enabled=spec.get("enabled", True),
+        )
+    return rules
+
+
+def select_rules(rules, names=None):
+    """Pick rules by name, or every enabled rule when no names are given."""
+    if not names:
+        return [r for r in rules.values() if r.enabled]
+
+    unknown = [n for n in names if n not in rules]
+    if unknown:
+        raise KeyError(f"Unknown recolor rule(s): {', '.join(unknown)}")
+    return [rules[n] for n in names]
+
+
+def compile_plan(rules):
+    """
+    Compile rules into a per-file plan.
+
+    Directory listings come from the asset catalog. The returned dict
+    maps every matched file to the rules that apply to it, in rule
+    order; files are sorted.
+    """
+    plan = {}
+
+    for rule in rules:
+        root = ROOTS[rule.root]
+        for tier in rule.dpi:
+            folder = root / tier if tier else root
+            for name in catalog().names(folder):
+                if rule.matches(name):
+                    plan.setdefault(folder / name, []).append(rule)
+
+    return dict(sorted(plan.items()))
+
+
+def apply_rules(image_path, rules):
+    """
+    Decode a file once, apply every rule in order and encode it once.
+
+    Returns:
+        List of rule names that changed at least one pixel
+    """
+    rgba = decode_cache().rgba_array(image_path)
+
+    applied = []
+    for rule in rules:
+        rgba, changed = shift_hue_array(
+            rgba, rule.hue_min, rule.hue_max, rule.min_saturation, rule.target_hue
+        )
+        if changed:
+            applied.append(rule.name)
+
+    if applied:
+        prepare_write(image_path)
+        save_png(Image.fromarray(rgba), image_path)
+    return applied
+
+
+def _recolor_task(task):
+    """Worker: apply a plan entry, returning (applied rule names, error)."""
+    image_path, rules = task
+    try:
+        return apply_rules(image_path, rules), None
+    except Exception as e:
+        return [], str(e)
+
+
+def _describe_task(task):
+    """Cache description of a plan entry: (output_id, sources, params, outputs)."""
+    image_path, rules = task
+    output_id = f"{rules[0].root}:{image_path.relative_to(ROOTS[rules[0].root])}"
+    params = {"rules": [asdict(rule) for rule in rules]}
+    return output_id, [image_path], params, [image_path]
+
+
+def stage_cache(args=None):
+    """Build cache for the recolor stage."""
+    code = [__file__, Path(__file__).parent / "recolor_kernel.py"]
+    return BuildCache.for_stage("recolor", code, args)
+
+
+def prune_plan(plan, index):
+    """
+    Drop plan entries none of whose rules can change the file.
+
+    A file is kept with all its rules as soon as one rule may match,
+    since an earlier rule can move pixels into a later rule's window.
+    """
+    return {
+        image_path: rules for image_path, rules in plan.items()
+        if any(
+            index.may_match(image_path, r.hue_min, r.hue_max, r.min_saturation)
+            for r in rules
+        )
+    }
+
+
+def run_plan(plan, jobs=None, memory_budget=None, cache=None, use_index=True):
+    """
+    Execute a compiled plan, spreading files across worker processes.
+
+    Files the hue index rules out are skipped without decoding. Files
+    whose bytes and rules match a cached result are restored from the
+    build cache instead of being decoded.
+
+    Returns:
+        Dict of rule name -> number of files it changed
+    """
+    counts = {rule.name: 0 for rules in plan.values() for rule in rules}
+    modified = 0
+    planned = len(plan)
+
+    if use_index:
+        index = HueIndex()
+        plan = prune_plan(plan, index)
+        index.save()
+
+    cache = cache or stage_cache()
+    run = partial(
+        run_parallel, jobs=jobs,
+        cost=lambda task: decoded_size(task[0]), memory_budget=memory_budget,
+    )
+    tasks = list(plan.items())
+    results = run_cached(
+        cache, tasks, _recolor_task, _describe_task, run=run,
+        cacheable=lambda result: result[1] is None,
+    )
+
+    for (image_path, rules), (applied, error) in zip(tasks, results):
+        if error:
+            print(f"  ✗ Error processing {image_path.name}: {error}")
+            continue
+
+        if applied:
+            modified += 1
+            root = ROOTS[rules[0].root]
+            print(f"  ✓ {image_path.relative_to(root)} ({', '.join(applied)})")
+            for name in applied:
+                counts[name] += 1
+
+    print(f"\n✓ Recolored {modified} files")
+    print(f"  Skipped: {planned - modified} (no matching hues)")
+    if use_index:
+        print(f"  Index: {planned - len(plan)} files ruled out without decoding")
+    cache.finish()
+    catalog().save()
+    return counts
+
+
+def run_rules(names=None, jobs=None, memory_budget=None, cache=None, use_index=True):
+    """Load, compile and run the named rules (or all enabled rules)."""
+    rules = select_rules(load_rules(), names)
+    return run_plan(
+        compile_plan(rules), jobs=jobs, memory_budget=memory_budget, cache=cache,
+        use_index=use_index,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply recolor_rules.json")
+    parser.add_argument("rules", nargs="*", help="Rule names (default: all enabled)")
+    parser.add_argument("--list", action="store_true", help="List rules and exit")
+    parser.add_argument("--no-index", action="store_true",
+                        help="Decode every matched file instead of consulting the hue index")
+    add_parallel_arguments(parser)
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
+    rules = load_rules()
+    if args.list:
+        for rule in rules.values():
+            state = "" if rule.enabled else " (disabled)"
+            print(f"  {rule.name}: {rule.root}, {len(rule.files)} patterns{state}")
+        return
+
+    try:
+        selected = select_rules(rules, args.rules)
+    except KeyError as e:
+        print(f"  ✗ {e.args[0]}")
+        sys.exit(1)
+
+    print("=" * 50)
+    print("Recoloring: " + ", ".join(r.name for r in selected))
+    print("=" * 50)
+    run_plan(compile_plan(selected), **parallel_options(args), cache=stage_cache(args),
+             use_index=not args.no_index)
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Indexed model of a WALTER rtconfig.txt.
+
+The file is split once into statements (a physical line plus any
+backslash continuation lines). Every statement is indexed by
+(keyword, name, scope), where scope is the enclosing macro name,
+'Layout <name>' or GLOBAL:
+
+    set trans.rew ...                  ("set", "trans.rew", "drawTrans")
+    define_parameter transMargin ...   ("define_parameter", "transMargin", GLOBAL)
+    transFollow trans.automode 58 36   ("transFollow", "trans.automode", "drawTrans")
+
+Edits look statements up directly instead of scanning the whole file
+with regular expressions. Each edit is idempotent (re-applying a value
+that is already there is a no-op) and every lookup or value that cannot
+be found is recorded in RtConfig.missing. The file is serialized once,
+with untouched statements written back verbatim.
+"""
+
+import re
+from pathlib import Path
+
+GLOBAL = "<global>"
+
+_BRACKET = re.compile(r"\[[^\[\]]*\]")
+_PARAM_DEFAULT = re.compile(r"^(\s*define_parameter\s+\S+\s+'[^']*'\s+)(\S+)")
+
+
+def _format_bracket(values):
+    if isinstance(values, str):
+        return values
+    return "[" + " ".join(str(v) for v in values) + "]"
+
+
+class Statement:
+    """One logical WALTER statement (continuation lines included)."""
+
+    def __init__(self, text, line, keyword, name, scope):
+        self.text = text
+        self.line = line
+        self.keyword = keyword
+        self.name = name
+        self.scope = scope
+
+    def __repr__(self):
+        return f"Statement({self.keyword!r}, {self.name!r}, {self.scope!r}, line {self.line})"
+
+    def _code_end(self):
+        """Offset where a trailing ';' comment starts (or the end)."""
+        index = self.text.find(";")
+        return len(self.text) if index < 0 else index
+
+    def brackets(self):
+        """Bracket groups ([...]) in the statement code, in order."""
+        return [m.group(0) for m in _BRACKET.finditer(self.text, 0, self._code_end())]
+
+    def set_bracket(self, index, values):
+        """Replace the index-th bracket group. Returns False if there is none."""
+        matches = list(_BRACKET.finditer(self.text, 0, self._code_end()))
+        if index >= len(matches):
+            return False
+        m = matches[index]
+        self.text = self.text[:m.start()] + _format_bracket(values) + self.text[m.end():]
+        return True
+
+    def replace_bracket(self, old, new):
+        """
+        Replace a bracket group by its content.
+
+        Returns:
+            True if old was replaced or new is already present
+        """
+        old, new = _format_bracket(old), _format_bracket(new)
+        groups = self.brackets()
+        if old in groups:
+            matches = [m for m in _BRACKET.finditer(self.text, 0, self._code_end())]
+            for m in reversed(matches):
+                if m.group(0) == old:
+                    self.text = self.text[:m.start()] + new + self.text[m.end():]
+            return True
+        return new in groups
+
+    def args(self):
+        """Whitespace-separated arguments after the keyword and name."""
+        return self.text[:self._code_end()].split()[2:]
+
+    def set_arg(self, index, value):
+        """Replace the index-th argument, keeping the surrounding whitespace."""
+        spans = [m.span() for m in re.finditer(r"\S+", self.text[:self._code_end()])][2:]
+        if index >= len(spans):
+            return False
+        start, end = spans[index]
+        self.text = self.text[:start] + str(value) + self.text[end:]
+        return True
+
+
+class RtConfig:
+    """Parsed rtconfig.txt with a (keyword, name, scope) statement index."""
+
+    def __init__(self, text):
+        self.statements = []
+        self.index = {}
+        self.missing = []
+
+        lines = text.splitlines(keepends=True)
+        scopes = [GLOBAL]
+        number = 0
+        while number < len(lines):
+            start = number
+            chunk = [lines[number]]
+            while chunk[-1].rstrip("\r\n").endswith("\\") and number + 1 < len(lines):
+                number += 1
+                chunk.append(lines[number])
+            number += 1
+            self._add("".join(chunk), start + 1, scopes)
+
+    def _add(self, text, line, scopes):
+        tokens = text.split(";", 1)[0].split()
+        keyword = tokens[0] if tokens else ""
+        name = tokens[1] if len(tokens) > 1 else ""
+        lowered = keyword.lower()
+        if lowered == "layout":
+            name = name.strip('"')
+
+        if lowered == "endmacro" or lowered == "endlayout":
+            if len(scopes) > 1:
+                scopes.pop()
+        statement = Statement(text, line, keyword, name, scopes[-1])
+        self.statements.append(statement)
+
+        if lowered == "macro":
+            scopes.append(name)
+        elif lowered == "layout":
+            scopes.append(f"Layout {name}")
+
+        if keyword and not keyword.startswith(("#", ";")):
+            key = (lowered if lowered in ("set", "define_parameter", "macro", "layout") else keyword,
+                   name, statement.scope)
+            self.index.setdefault(key, []).append(statement)
+
+    @classmethod
+    def load(cls, path):
+        """Parse an rtconfig.txt file."""
+        with open(path, 'r', newline='') as f:
+            return cls(f.read())
+
+    def find(self, keyword, name, scope=GLOBAL):
+        """Statements for (keyword, name, scope); records a miss if there are none."""
+        found = self.index.get((keyword, name, scope), [])
+        if not found:
+            self.missing.append(f"{keyword} {name} (in {scope})")
+        return found
+
+    def set_bracket(self, name, index, values, scope=GLOBAL, occurrence=0):
+        """
+        Set the index-th bracket group of a 'set name' statement in scope.
+
+        occurrence picks among repeated sets of the same name (0 = first).
+        """
+        statements = self.find("set", name, scope)
+        if not statements:
+            return
+        if occurrence >= len(statements):
+            self.missing.append(f"set {name} occurrence #{occurrence} (in {scope})")
+            return
+        statement = statements[occurrence]
+        if not statement.set_bracket(index, values):
+            self.missing.append(f"set {name} bracket #{index} (line {statement.line})")
+
+    def replace_bracket(self, name, old, new, scope=GLOBAL):
+        """Replace bracket group old with new in the 'set name' statements of scope."""
+        statements = self.find("set", name, scope)
+        if statements and not any([s.replace_bracket(old, new) for s in statements]):
+            self.missing.append(f"set {name} {_format_bracket(old)} (in {scope})")
+
+    def set_parameter_default(self, name, value):
+        """Set the default value of a define_parameter."""
+        for statement in self.find("define_parameter", name):
+            m = _PARAM_DEFAULT.match(statement.text)
+            if not m:
+                self.missing.append(f"define_parameter {name} default (line {statement.line})")
+                continue
+            statement.text = m.group(1) + str(value) + statement.text[m.end():]
+
+    def set_call_arg(self, macro, name, index, value, scope=GLOBAL):
+        """Set an argument of a macro call such as 'transFollow <name> w h'."""
+        for statement in self.find(macro, name, scope):
+            if not statement.set_arg(index, value):
+                self.missing.append(f"{macro} {name} argument #{index} (line {statement.line})")
+
+    def serialize(self):
+        """Render the file back to text in one pass."""
+        return "".join(statement.text for statement in self.statements)
+
+    def save(self, path):
+        """Write the file to path."""
+        with open(Path(path), 'w', newline='') as f:
+            f.write(self.serialize())
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Shared sprite-sheet engine for the sprite scripts.
+
+REAPER button sprites are 3 frames side by side ([Normal] [Hover]
+[Active]), each frame a resized copy of one source icon, optionally
+brightened. The engine memoizes every step of that pipeline:
+
+    source     decoded once per file, keyed by content hash (pixels are
+               mapped from the decode cache across runs, see decode_cache.py)
+    frame      LANCZOS resize, keyed by (source hash, size)
+    variant    brightness state, keyed by (frame, factor)
+    sheet      composed sprite, keyed by (frame, factors, gap)
+    tier       sheet scaled or downsampled to another DPI tier
+
+so a source used for several outputs is decoded and resized once, and
+identical sprites are composed and PNG-encoded once, then written to
+every destination name.
+
+Brightness states are applied through 256-entry lookup tables that
+reproduce ImageEnhance.Brightness exactly (Pillow blends against black
+in float32 and truncates), leaving alpha untouched. An RGBA sheet looks
+all of its states up in one stacked numpy buffer.
+
+A module-level engine is shared by everything running in one process;
+the sprite scripts group their work by source file so each worker
+process sees all the outputs of the sources it renders.
+
+When capture is set to a dict, write() records {destination: image}
+there instead of encoding and saving, so a worker can hand its sprites
+to the parent's image store (see image_store.py).
+"""
+
+import functools
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from asset_catalog import catalog
+from build_fs import prepare_write
+from build_profile import encode_png
+from decode_cache import decode
+import tracing
+
+# Modes whose color bands brightness_table() covers; the last band of
+# the *A modes is alpha and passes through unchanged
+_LUT_BANDS = {"L": 1, "LA": 1, "RGB": 3, "RGBA": 3}
+
+
+@functools.lru_cache(maxsize=None)
+def brightness_lut(factor):
+    """
+    256-entry table equivalent to ImageEnhance.Brightness(factor).
+
+    Pillow computes float(factor) * value in single precision, truncates
+    and clips to 0..255; the table does the same arithmetic once.
+    """
+    values = np.arange(256, dtype=np.float32) * np.float32(factor)
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+
+def brightness_table(mode, factor):
+    """Image.point() table applying brightness_lut to the color bands of mode."""
+    lut = brightness_lut(factor).tolist()
+    table = lut * _LUT_BANDS[mode]
+    if mode.endswith("A"):
+        table += list(range(256))
+    return table
+
+
+def _derives_from(key, digests):
+    """Whether a memo key (nested tuples of parts) contains one of digests."""
+    return any(_derives_from(part, digests) if isinstance(part, tuple) else part in digests
+               for part in key)
+
+
+class SpriteEngine:
+    """Memoizing renderer for multi-state sprite sheets."""
+
+    def __init__(self):
+        self._sources = {}   # path -> (digest, image)
+        self._memo = {}      # (kind, ...) -> image
+        self._encoded = {}   # image key -> PNG bytes
+        self.capture = None  # destination path -> image, instead of writing
+
+    def _cached(self, key, build):
+        image = self._memo.get(key)
+        if image is None:
+            image = self._memo[key] = build()
+        return image
+
+    def source(self, path):
+        """
+        Decode a source file once.
+
+        Returns:
+            (digest, image) where digest identifies the file content
+        """
+        path = Path(path)
+        entry = self._sources.get(path)
+        if entry is None:
+            digest = catalog().digest(path)
+            if digest is None:
+                raise FileNotFoundError(f"No such file: '{path}'")
+            entry = self._sources[path] = (digest, decode(path, digest))
+        return entry
+
+    def forget_sources(self):
+        """
+        Drop decoded sources so changed files are read again, and prune the
+        derived and encoded images of content that no source has any more
+        (their keys start from the source digest). Call after the asset
+        catalog has been refreshed.
+        """
+        old = {digest for digest, _ in self._sources.values()}
+        current = {catalog().digest(path) for path in self._sources}
+        self._sources.clear()
+        stale = old - current
+        if stale:
+            self._memo = {k: v for k, v in self._memo.items() if not _derives_from(k, stale)}
+            self._encoded = {k: v for k, v in self._encoded.items() if not _derives_from(k, stale)}
+
+    def clear(self):
+        """Drop every decoded, derived and encoded image."""
+        self._sources.clear()
+        self._memo.clear()
+        self._encoded.clear()
+
+    def frame(self, path, size):
+        """Source resized to size with LANCZOS. Returns (key, image)."""
+        digest, image = self.source(path)
+        key = ("frame", digest, tuple(size))
+        return key, self._cached(key, lambda: image.resize(tuple(size), Image.Resampling.LANCZOS))
+
+    def fitted_frame(self, path, size):
+        """
+        Source scaled to fit size (aspect preserved), centered on a
+        transparent frame. Returns (key, image).
+        """
+        digest, image = self.source(path)
+        key = ("fitted", digest, tuple(size))
+
+        def build():
+            scale = min(size[0] / image.width, size[1] / image.height)
+            new_w = int(image.width * scale)
+            new_h = int(image.height * scale)
+            resized = image.resize((new_w, new_h), Image.Resampling.LANCZOS)
+
+            frame = Image.new('RGBA', tuple(size), (0, 0, 0, 0))
+            x = (size[0] - new_w) // 2
+            y = (size[1] - new_h) // 2
+            frame.paste(resized, (x, y), resized)
+            return frame
+
+        return key, self._cached(key, build)
+
+    def variant(self, frame_key, factor):
+        """Brightness state of a memoized frame. Returns (key, image)."""
+        frame = self._memo[frame_key]
+        if factor == 1.0:
+            return frame_key, frame
+        key = ("variant", frame_key, factor)
+
+        def build():
+            if frame.mode in _LUT_BANDS:
+                return frame.point(brightness_table(frame.mode, factor))
+            return ImageEnhance.Brightness(frame).enhance(factor)
+
+        return key, self._cached(key, build)
+
+    def sheet(self, frame_key, factors, gap=0):
+        """
+        Compose one frame per brightness factor side by side.
+
+        Returns:
+            (key, image)
+        """
+        key = ("sheet", frame_key, tuple(factors), gap)
+
+        def build():
+            frame = self._memo[frame_key]
+            width, height = frame.size
+            cell = width + gap
+            if frame.mode == 'RGBA':
+                return self._stacked_sheet(frame, factors, cell)
+
+            sprite = Image.new('RGBA', (cell * len(factors), height), (0, 0, 0, 0))
+            for i, factor in enumerate(factors):
+                _, state = self.variant(frame_key, factor)
+                sprite.paste(state, (i * cell, 0))
+            return sprite
+
+        return key, self._cached(key, build)
+
+    @staticmethod
+    def _stacked_sheet(frame, factors, cell):
+        """
+        Compose an RGBA sheet with one table lookup over all states.
+
+        The color bands of the frame are indexed by a (states, 256) table
+        stack in a single numpy operation; alpha is copied into every cell.
+        """
+        pixels = np.asarray(frame)
+        width = pixels.shape[1]
+        luts = np.stack([brightness_lut(factor) for factor in factors])
+        states = luts[np.arange(len(factors))[:, None, None, None], pixels[None, :, :, :3]]
+
+        sheet = np.zeros((pixels.shape[0], cell * len(factors), 4), dtype=np.uint8)
+        for i, state in enumerate(states):
+            x = i * cell
+            sheet[:, x:x + width, :3] = state
+            sheet[:, x:x + width, 3] = pixels[:, :, 3]
+        return Image.fromarray(sheet, 'RGBA')
+
+    def scaled(self, image_key, scale):
+        """A memoized image resized by scale with LANCZOS. Returns (key, image)."""
+        if scale == 1.0:
+            return image_key, self._memo[image_key]
+        image = self._memo[image_key]
+        key = ("scaled", image_key, scale)
+        size = (int(image.width * scale), int(image.height * scale))
+        return key, self._cached(key, lambda: image.resize(size, Image.Resampling.LANCZOS))
+
+    def downsampled(self, image_key, size):
+        """
+        A memoized image shrunk to size. Uses Image.reduce when size
+        divides the image by the same integer in both axes, LANCZOS
+        otherwise. Returns (key, image).
+        """
+        image = self._memo[image_key]
+        size = tuple(size)
+        if size == image.size:
+            return image_key, image
+        key = ("downsampled", image_key, size)
+
+        def build():
+            factor, remainder = divmod(image.width, size[0])
+            if remainder == 0 and factor > 1 and image.height == size[1] * factor:
+                return image.reduce(factor)
+            return image.resize(size, Image.Resampling.LANCZOS)
+
+        return key, self._cached(key, build)
+
+    def encode(self, image_key):
+        """PNG bytes of a memoized image, encoded once (see build_profile.py)."""
+        data = self._encoded.get(image_key)
+        if data is None:
+            data = self._encoded[image_key] = encode_png(self._memo[image_key])
+        return data
+
+    def write(self, image_key, dest_paths):
+        """Write a memoized image to every destination path."""
+        image = self._memo[image_key]
+        data = self.encode(image_key) if self.capture is None else None
+        for dest in dest_paths:
+            with tracing.file_span(dest):
+                tracing.add(files=1, pixels=image.width * image.height)
+                if data is None:
+                    self.capture[str(dest)] = image
+                    continue
+                dest = Path(dest)
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                prepare_write(dest)
+                dest.write_bytes(data)
+                tracing.add(bytes_written=len(data))
+
+
+# Engine shared by the sprite scripts within one process
+ENGINE = SpriteEngine()
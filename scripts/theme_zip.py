@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Deterministic, parallel writer for .ReaperThemeZip archives.
+
+Entries are deflated on a thread pool (zlib releases the GIL) and then
+written in sorted archive-name order with a fixed timestamp
+(1980-01-01 00:00) and fixed permissions (0644). The same inputs always
+produce a byte-identical archive, so artifacts can be compared by hash.
+
+update_zip() rewrites an existing archive incrementally: it reads the
+central directory, keeps the raw compressed bytes of members whose
+SHA-256 still matches the file on disk, and compresses only the rest.
+Member hashes are kept in a manifest under .build_cache/zip_members/,
+written with the archive and tied to the archive's own SHA-256; a
+missing manifest or an archive changed behind its back means a full
+rewrite, never reuse on CRC-32 alone. The archive comment records the
+compression profile; an archive written with a different profile is
+recompressed in full.
+
+Member sources are file paths or, for content that only exists in
+memory (see image_store.py), bytes.
+
+Only the subset of the zip format REAPER needs is written: no zip64,
+no extra fields, no entry comments.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from parallel import default_jobs
+import tracing
+
+# zipfile's default deflate level
+DEFAULT_LEVEL = 6
+
+STORED = 0
+DEFLATED = 8
+
+# 1980-01-01 00:00:00 in MS-DOS date/time format
+DOS_DATE = (0 << 9) | (1 << 5) | 1
+DOS_TIME = 0
+
+# Unix regular file, rw-r--r--
+EXTERNAL_ATTR = (0o100644 << 16)
+# "Made by" Unix, spec version 2.0
+VERSION_MADE_BY = (3 << 8) | 20
+VERSION_NEEDED = 20
+UTF8_FLAG = 0x800
+
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+END_RECORD = struct.Struct("<4s4H2LH")
+
+LOCAL_SIG = b"PK\x03\x04"
+CENTRAL_SIG = b"PK\x01\x02"
+END_SIG = b"PK\x05\x06"
+
+ZIP32_LIMIT = 0xFFFFFFFF
+
+# How far from the end of the file the end record can start (max comment + record)
+END_SEARCH = 0xFFFF + END_RECORD.size
+
+# Member content hashes of the archives written, one manifest per output path
+MANIFEST_DIR = Path(__file__).parent.parent / ".build_cache" / "zip_members"
+
+
+class ZipFormatError(Exception):
+    """An archive could not be parsed."""
+
+
+class ZipEntry:
+    """A compressed archive member ready to be written."""
+
+    __slots__ = ("name", "method", "crc", "size", "data")
+
+    def __init__(self, name, method, crc, size, data):
+        self.name = name
+        self.method = method
+        self.crc = crc
+        self.size = size
+        self.data = data
+
+
+def collect_files(root, prefix):
+    """
+    List files under root as (archive name, path) pairs.
+
+    Archive names use forward slashes and start with prefix.
+    """
+    files = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            files.append((f"{prefix}/{path.relative_to(root).as_posix()}", path))
+    return files
+
+
+def compress_bytes(name, raw, level=DEFAULT_LEVEL):
+    """Deflate raw bytes; falls back to STORED when deflate does not help."""
+    with tracing.span(name, "zip"):
+        entry = _compress(name, raw, level)
+        tracing.add(files=1, bytes_read=len(raw), bytes_written=len(entry.data))
+    return entry
+
+
+def _compress(name, raw, level):
+    crc = zlib.crc32(raw)
+    if level == 0:
+        return ZipEntry(name, STORED, crc, len(raw), raw)
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    data = compressor.compress(raw) + compressor.flush()
+    if len(data) >= len(raw):
+        return ZipEntry(name, STORED, crc, len(raw), raw)
+    return ZipEntry(name, DEFLATED, crc, len(raw), data)
+
+
+def read_source(source):
+    """Bytes of a member source (a path, or bytes already in memory)."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def compress_file(name, source, level=DEFAULT_LEVEL):
+    """Read and compress one file (path or bytes) into a ZipEntry."""
+    return compress_bytes(name, read_source(source), level)
+
+
+def profile_comment(level):
+    """Archive comment identifying the compression profile."""
+    return f"theme_zip deflate level={level}".encode()
+
+
+def _name_fields(name):
+    encoded = name.encode("utf-8")
+    flags = 0 if encoded.isascii() else UTF8_FLAG
+    return encoded, flags
+
+
+def write_entries(output, entries, comment=b""):
+    """
+    Write compressed entries to output in the given order.
+
+    The archive is written to a temporary file and moved into place.
+    """
+    output = Path(output)
+    tmp = output.with_name(output.name + ".tmp")
+    central = []
+    offset = 0
+
+    with open(tmp, 'wb') as f:
+        for entry in entries:
+            encoded, flags = _name_fields(entry.name)
+            if offset > ZIP32_LIMIT or entry.size > ZIP32_LIMIT:
+                raise ValueError(f"{entry.name}: archive too large for zip32")
+
+            header = LOCAL_HEADER.pack(
+                LOCAL_SIG, VERSION_NEEDED, flags, entry.method, DOS_TIME, DOS_DATE,
+                entry.crc, len(entry.data), entry.size, len(encoded), 0,
+            )
+            f.write(header)
+            f.write(encoded)
+            f.write(entry.data)
+
+            central.append(CENTRAL_HEADER.pack(
+                CENTRAL_SIG, VERSION_MADE_BY, VERSION_NEEDED, flags, entry.method,
+                DOS_TIME, DOS_DATE, entry.crc, len(entry.data), entry.size,
+                len(encoded), 0, 0, 0, 0, EXTERNAL_ATTR, offset,
+            ) + encoded)
+            offset += len(header) + len(encoded) + len(entry.data)
+
+        directory = b"".join(central)
+        f.write(directory)
+        f.write(END_RECORD.pack(
+            END_SIG, 0, 0, len(central), len(central),
+            len(directory), offset, len(comment),
+        ))
+        f.write(comment)
+
+    os.replace(tmp, output)
+
+
+def write_zip(output, files, level=DEFAULT_LEVEL, jobs=None):
+    """
+    Compress files in parallel and write a deterministic archive.
+
+    Args:
+        output: Destination .ReaperThemeZip path
+        files: Iterable of (archive name, path or bytes) pairs
+        level: zlib level (0 stores everything)
+        jobs: Compression threads (default: BUILD_JOBS or CPU count)
+
+    Returns:
+        Number of entries written
+    """
+    files = _sorted_unique(files)
+
+    def compress(item):
+        name, source = item
+        raw = read_source(source)
+        return _content_hash(raw), compress_bytes(name, raw, level)
+
+    with ThreadPoolExecutor(max_workers=jobs or default_jobs()) as pool:
+        compressed = list(pool.map(compress, files))
+
+    entries = [entry for _, entry in compressed]
+    write_entries(output, entries, profile_comment(level))
+    _save_manifest(output, {entry.name: digest for digest, entry in compressed})
+    return len(entries)
+
+
+def _content_hash(raw):
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _manifest_path(output):
+    key = hashlib.sha256(os.path.abspath(output).encode()).hexdigest()[:32]
+    return MANIFEST_DIR / f"{key}.json"
+
+
+def _archive_hash(output):
+    with open(output, 'rb') as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _load_manifest(output):
+    """Member name -> SHA-256 of output, or None if unknown or out of date."""
+    try:
+        with open(_manifest_path(output), 'r') as f:
+            manifest = json.load(f)
+        if manifest["archive"] != _archive_hash(output):
+            return None
+        return manifest["members"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_manifest(output, members):
+    """Record member hashes for the next update_zip() (best effort)."""
+    path = _manifest_path(output)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump({"archive": _archive_hash(output), "members": members}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _sorted_unique(files):
+    files = sorted(files, key=lambda item: item[0])
+    names = [name for name, _ in files]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate archive names")
+    return files
+
+
+def read_directory(path):
+    """
+    Parse an archive's central directory.
+
+    Returns:
+        (members, comment) where members maps archive name ->
+        (method, crc, compressed size, size, local header offset)
+
+    Raises:
+        ZipFormatError: if the archive is truncated or not a zip file
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        f.seek(max(0, file_size - END_SEARCH))
+        tail = f.read()
+
+        end = tail.rfind(END_SIG)
+        if end < 0 or end + END_RECORD.size > len(tail):
+            raise ZipFormatError(f"{path}: end of central directory not found")
+        _, _, _, _, count, dir_size, dir_offset, comment_len = END_RECORD.unpack_from(tail, end)
+        comment = tail[end + END_RECORD.size:end + END_RECORD.size + comment_len]
+
+        f.seek(dir_offset)
+        directory = f.read(dir_size)
+
+    members = {}
+    pos = 0
+    for _ in range(count):
+        if directory[pos:pos + 4] != CENTRAL_SIG:
+            raise ZipFormatError(f"{path}: bad central directory entry")
+        fields = CENTRAL_HEADER.unpack_from(directory, pos)
+        (_, _, _, flags, method, _, _, crc, csize, size,
+         name_len, extra_len, comment_len, _, _, _, offset) = fields
+        start = pos + CENTRAL_HEADER.size
+        raw_name = directory[start:start + name_len]
+        name = raw_name.decode("utf-8" if flags & UTF8_FLAG else "cp437")
+        members[name] = (method, crc, csize, size, offset)
+        pos = start + name_len + extra_len + comment_len
+
+    return members, comment
+
+
+def read_raw(f, member):
+    """Read a member's compressed bytes from an open archive."""
+    csize, offset = member[2], member[4]
+    f.seek(offset)
+    header = f.read(LOCAL_HEADER.size)
+    if header[:4] != LOCAL_SIG:
+        raise ZipFormatError("bad local file header")
+    name_len, extra_len = LOCAL_HEADER.unpack(header)[-2:]
+    f.seek(name_len + extra_len, os.SEEK_CUR)
+    return f.read(csize)
+
+
+def update_zip(output, files, level=DEFAULT_LEVEL, jobs=None):
+    """
+    Bring an existing archive up to date with the given files.
+
+    Members whose SHA-256 (from the manifest) and size match the file on
+    disk keep their compressed bytes; changed and new files are
+    compressed in parallel; members no longer listed are dropped. The
+    result is byte-identical to write_zip() with the same inputs. Falls
+    back to a full write when the archive is missing, unreadable, used
+    another profile or has no up-to-date manifest.
+
+    Returns:
+        (reused, compressed) entry counts
+    """
+    comment = profile_comment(level)
+    try:
+        members, existing_comment = read_directory(output)
+    except (OSError, ZipFormatError, ValueError):
+        members, existing_comment = {}, None
+    if existing_comment != comment:
+        members = {}
+    hashes = _load_manifest(output) if members else None
+
+    files = _sorted_unique(files)
+    if not hashes:
+        return 0, write_zip(output, files, level, jobs)
+
+    def read_file(item):
+        name, source = item
+        raw = read_source(source)
+        return name, raw, _content_hash(raw)
+
+    entries = []
+    stale = []
+    digests = {}
+    with ThreadPoolExecutor(max_workers=jobs or default_jobs()) as pool:
+        with open(output, 'rb') as archive:
+            for name, raw, digest in pool.map(read_file, files):
+                digests[name] = digest
+                member = members.get(name)
+                if member and hashes.get(name) == digest and member[3] == len(raw):
+                    data = read_raw(archive, member)
+                    entries.append(ZipEntry(name, member[0], member[1], len(raw), data))
+                else:
+                    entries.append(None)
+                    stale.append((len(entries) - 1, name, raw))
+
+        compressed = pool.map(lambda job: compress_bytes(job[1], job[2], level), stale)
+        for (index, _, _), entry in zip(stale, compressed):
+            entries[index] = entry
+
+    write_entries(output, entries, comment)
+    _save_manifest(output, digests)
+    return len(entries) - len(stale), len(stale)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Span tracing for the build, in Chrome trace-event format.
+
+While a tracer is active, the pipeline records a span per stage, the
+cached stages a span per output group, and the write points a span per
+file (file_span(): sprites, recolored icons, rewritten theme files,
+copies) and per compressed zip member. Each span has wall time, thread
+CPU time and counters that the code below it adds to:
+
+    files, pixels              outputs rendered and their pixel count
+    bytes_read, bytes_written  file and store I/O
+    cache_hits, cache_misses   build cache lookups
+
+Counters roll up into the enclosing span, so a stage span carries the
+totals of its files. Zip members are compressed on packaging threads
+with no enclosing span, so their spans stand alone; create_zip adds
+the member count, the bytes packaged and the archive size to its stage
+instead. Work done in pool workers is traced in the worker and its
+spans are shipped back with the result (see parallel.py and
+call_traced()); their CPU time is added to the stage as worker_cpu_ms.
+
+Traces are written as JSON for chrome://tracing or https://ui.perfetto.dev,
+and summarized per stage as a text table. With profiling on, every stage
+also runs under cProfile and tracemalloc, and the reports are saved next
+to the trace as <stage>.prof (pstats) and <stage>.txt.
+
+When no tracer is active, span() and add() do nothing. build_all.py
+--trace and --cprofile activate one for the build.
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+TRACE_FILE = PROJECT_ROOT / ".build_cache" / "trace" / "build.trace.json"
+
+# Counters shown in the summary table, in column order
+SUMMARY_COUNTERS = ("files", "pixels", "bytes_read", "bytes_written", "cache_hits", "cache_misses")
+
+
+class Tracer:
+    """Collects spans from every thread of this process (and merged workers)."""
+
+    def __init__(self, profile_dir=None, origin=None, worker=False):
+        """
+        Args:
+            profile_dir: Where profile() saves per-stage reports (None: no profiling)
+            origin: perf_counter_ns() timestamp 0 of the trace (default: now);
+                workers use the parent's so their spans line up with it
+            worker: Whether this tracer records spans for a parent's tracer
+        """
+        self.origin = time.perf_counter_ns() if origin is None else origin
+        self.events = []
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.worker = worker
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextlib.contextmanager
+    def span(self, name, category="file", **args):
+        """Record a span around the block; yields its counter dict."""
+        stack = self._stack()
+        counters = {}
+        frame = {"args": dict(args), "counters": counters}
+        stack.append(frame)
+        start = time.perf_counter_ns()
+        cpu_start = time.thread_time_ns()
+        try:
+            yield counters
+        finally:
+            cpu = time.thread_time_ns() - cpu_start
+            end = time.perf_counter_ns()
+            stack.pop()
+            if stack:
+                _merge_counters(stack[-1]["counters"], counters)
+            elif self.worker:
+                # Rolls up into the caller's span when merged (see merge())
+                frame["args"]["top"] = True
+            self._record({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self.origin) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+                "args": {**frame["args"], **counters, "cpu_ms": round(cpu / 1e6, 3)},
+            })
+
+    def _record(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def add(self, **counters):
+        """Add to the counters of this thread's innermost span."""
+        stack = self._stack()
+        if stack:
+            _merge_counters(stack[-1]["counters"], counters)
+
+    def annotate(self, **args):
+        """Set arguments on this thread's innermost span."""
+        stack = self._stack()
+        if stack:
+            stack[-1]["args"].update(args)
+
+    def drain(self):
+        """Take the recorded events (used by workers to ship them home)."""
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+    def merge(self, events):
+        """
+        Add events recorded in a worker. Top-level worker spans roll their
+        counters (and CPU time) into this thread's innermost span.
+        """
+        with self._lock:
+            self.events.extend(events)
+        for event in events:
+            if event.get("args", {}).pop("top", False):
+                counters = {k: v for k, v in event["args"].items() if k in SUMMARY_COUNTERS}
+                counters["worker_cpu_ms"] = event["args"].get("cpu_ms", 0)
+                self.add(**counters)
+
+    @contextlib.contextmanager
+    def profile(self, name):
+        """Run the block under cProfile and tracemalloc and save the reports."""
+        if self.profile_dir is None:
+            yield
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            self._save_profile(name, profiler, before, after, peak)
+
+    def _save_profile(self, name, profiler, before, after, peak):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(self.profile_dir / f"{name}.prof"))
+
+        report = io.StringIO()
+        report.write(f"{name}: cProfile, top 40 by cumulative time\n\n")
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(40)
+        report.write(f"\n{name}: tracemalloc, peak {peak / 1024 / 1024:.1f} MB, "
+                     "top 25 allocation sites by growth\n\n")
+        for stat in after.compare_to(before, "lineno")[:25]:
+            report.write(f"{stat}\n")
+        (self.profile_dir / f"{name}.txt").write_text(report.getvalue())
+
+    # -- output ----------------------------------------------------------
+
+    def write(self, path=TRACE_FILE):
+        """Write the trace as Chrome trace-event JSON."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            events = list(self.events)
+
+        # Name the lanes: the build process, its stage threads and workers
+        metadata = []
+        for pid in sorted({e["pid"] for e in events}):
+            label = "build" if pid == os.getpid() else f"worker {pid}"
+            metadata.append({"name": "process_name", "ph": "M", "pid": pid,
+                             "args": {"name": label}})
+        lanes = {}
+        for event in sorted(events, key=lambda e: e["ts"]):
+            if event["cat"] == "stage":
+                lanes.setdefault((event["pid"], event["tid"]), []).append(event["name"])
+        for (pid, tid), names in sorted(lanes.items()):
+            metadata.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                             "args": {"name": ", ".join(names)}})
+
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+        os.replace(tmp, path)
+
+    def summary(self):
+        """Per-stage rows: (name, wall ms, cpu ms, counters), in start order."""
+        with self._lock:
+            stages = sorted((e for e in self.events if e["cat"] == "stage"), key=lambda e: e["ts"])
+        return [
+            (e["name"], e["dur"] / 1000,
+             e["args"].get("cpu_ms", 0) + e["args"].get("worker_cpu_ms", 0), e["args"])
+            for e in stages
+        ]
+
+    def print_summary(self):
+        """Print the per-stage summary table."""
+        rows = self.summary()
+        if not rows:
+            return
+        headers = ("stage", "wall ms", "cpu ms", "files", "pixels", "read", "written",
+                   "hits", "misses")
+        table = [headers]
+        for name, wall, cpu, args in rows:
+            table.append((
+                name, f"{wall:.1f}", f"{cpu:.1f}", str(args.get("files", 0)),
+                _human(args.get("pixels", 0), ""), _human(args.get("bytes_read", 0), "B"),
+                _human(args.get("bytes_written", 0), "B"), str(args.get("cache_hits", 0)),
+                str(args.get("cache_misses", 0)),
+            ))
+        widths = [max(len(row[i]) for row in table) for i in range(len(headers))]
+        print("\nTrace summary:")
+        for row in table:
+            cells = [row[0].ljust(widths[0])] + [c.rjust(w) for c, w in zip(row[1:], widths[1:])]
+            print("  " + "  ".join(cells))
+
+
+def _merge_counters(target, counters):
+    for key, value in counters.items():
+        target[key] = target.get(key, 0) + value
+
+
+def _human(value, unit):
+    """Compact count: 950, 12.3K, 4.5M."""
+    if value < 1000:
+        return f"{value:.0f}{unit}"
+    for suffix in ("K", "M", "G"):
+        value /= 1000
+        if value < 1000 or suffix == "G":
+            return f"{value:.1f}{suffix}{unit}"
+
+
+_active = None
+
+
+def active_tracer():
+    """The tracer of the running build, or None when tracing is off."""
+    return _active
+
+
+def start_tracing(profile_dir=None):
+    """Activate a new tracer for this process."""
+    global _active
+    _active = Tracer(profile_dir)
+    return _active
+
+
+def stop_tracing():
+    """Deactivate tracing; returns the tracer that was active."""
+    global _active
+    tracer, _active = _active, None
+    return tracer
+
+
+@contextlib.contextmanager
+def span(name, category="file", **args):
+    """Tracer.span() on the active tracer; does nothing when tracing is off."""
+    if _active is None:
+        yield {}
+        return
+    with _active.span(name, category, **args) as counters:
+        yield counters
+
+
+def file_span(path, **args):
+    """span() for one file, named by its path relative to the project."""
+    if _active is None:
+        return contextlib.nullcontext({})
+    path = os.path.abspath(path)
+    root = str(PROJECT_ROOT.absolute())
+    if path.startswith(root + os.sep):
+        path = os.path.relpath(path, root)
+    return _active.span(path, "file", **args)
+
+
+def add(**counters):
+    """Tracer.add() on the active tracer, if any."""
+    if _active is not None:
+        _active.add(**counters)
+
+
+def annotate(**args):
+    """Tracer.annotate() on the active tracer, if any."""
+    if _active is not None:
+        _active.annotate(**args)
+
+
+def profile(name):
+    """Tracer.profile() on the active tracer; a no-op context otherwise."""
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.profile(name)
+
+
+def call_traced(func, item, origin):
+    """
+    Worker side of a traced pool call: run func(item) and return
+    (result, events recorded while it ran). run_parallel merges the
+    events into the parent's tracer.
+
+    Workers do not inherit the parent's tracer (pools are started with
+    spawn or forkserver), so the first traced call in a worker starts a
+    worker tracer on the parent's origin.
+    """
+    global _active
+    if _active is None or not _active.worker or _active.origin != origin:
+        _active = Tracer(origin=origin, worker=True)
+    result = func(item)
+    return result, _active.drain()
@@ -3,9 +3,11 @@
 Update rtconfig.txt settings for the Default 7.0 DarkMinimal theme.
 """
 
-import re
 from pathlib import Path
 
+from image_store import read_file, write_file
+from rtconfig import RtConfig
+
 RTCONFIG_PATH = Path(__file__).parent.parent / "build" / "Default_7.0_DarkMinimal_unpacked" / "rtconfig.txt"
 
 # Transport bar settings
@@ -16,106 +18,85 @@ BUTTON_SPACING = 2     # Tight spacing
 BUTTON_Y_OFFSET = 2    # Center vertically: (40-36)/2 = 2
 STATUS_WIDTH = 340     # Default was 450
 SECTION_WIDTH = 380    # Width for buttons section
+STATUS_COLOR = 70      # Intended status background grey level (theme default 51)
 
 
 def update_rtconfig():
     """Update rtconfig.txt with new transport settings."""
     
-    with open(RTCONFIG_PATH, 'r') as f:
-        content = f.read()
+    config = RtConfig(read_file(RTCONFIG_PATH).decode())
+    scope = "drawTrans"
 
-    # Button size replacements (width height patterns)
-    # Format: [x_offset y_offset width height]
-    button_replacements = [
-        # (pattern to find, replacement)
-        (r"(set trans\.rew\s+.*Scale )\[0 0 \d+ \d+\]", f"\\1[0 0 {BUTTON_WIDTH} {BUTTON_HEIGHT}]"),
-        (r"(set trans\.fwd\s+.*Scale )\[\d+ 0 \d+ \d+\]", f"\\1[{BUTTON_SPACING} 0 {BUTTON_WIDTH} {BUTTON_HEIGHT}]"),
-        (r"(set trans\.rec\s+.*Scale )\[\d+ 0 \d+ \d+\]", f"\\1[{BUTTON_SPACING} 0 {BUTTON_WIDTH} {BUTTON_HEIGHT}]"),
-        (r"(set trans\.play\s+.*Scale )\[-?\d+ 0 \d+ \d+\]", f"\\1[{BUTTON_SPACING} 0 {BUTTON_WIDTH} {BUTTON_HEIGHT}]"),
-        (r"(set trans\.repeat\s+.*Scale )\[-?\d+ 0 \d+ \d+\]", f"\\1[{BUTTON_SPACING} 0 {BUTTON_WIDTH} {BUTTON_HEIGHT}]"),
-        (r"(set trans\.stop\s+.*Scale )\[\d+ 0 \d+ \d+\]", f"\\1[{BUTTON_SPACING} 0 {BUTTON_WIDTH} {BUTTON_HEIGHT}]"),
-        (r"(set trans\.pause\s+.*Scale )\[\d+ 0 \d+ \d+\]", f"\\1[{BUTTON_SPACING} 0 {BUTTON_WIDTH} {BUTTON_HEIGHT}]"),
-    ]
-    
-    for pattern, replacement in button_replacements:
-        content = re.sub(pattern, replacement, content)
+    # Button size replacements: the [x_offset y_offset width height] after "* Scale"
+    config.set_bracket("trans.rew", 1, [0, 0, BUTTON_WIDTH, BUTTON_HEIGHT], scope)
+    for button in ["fwd", "rec", "play", "repeat", "stop", "pause"]:
+        config.set_bracket(
+            f"trans.{button}", 1, [BUTTON_SPACING, 0, BUTTON_WIDTH, BUTTON_HEIGHT], scope
+        )
     
     # Update sectionButtons: [transMargin y_offset width height] - center vertically
-    content = re.sub(
-        r"(set trans\.custom\.sectionButtons\s+\+ \* Scale )\[transMargin \d+ \d+ \d+\]",
-        f"\\1[transMargin {BUTTON_Y_OFFSET} {SECTION_WIDTH} {BUTTON_HEIGHT}]",
-        content
+    config.set_bracket(
+        "trans.custom.sectionButtons", 0,
+        ["transMargin", BUTTON_Y_OFFSET, SECTION_WIDTH, BUTTON_HEIGHT], scope,
     )
     
     # Update status width parameter
-    content = re.sub(
-        r"(define_parameter transStatusWidth\s+'Status Width' )\d+",
-        f"\\g<1>{STATUS_WIDTH}",
-        content
-    )
+    config.set_parameter_default("transStatusWidth", STATUS_WIDTH)
     
     # Update transport heights (36 -> TRANSPORT_HEIGHT)
     # trans.size, trans.size.dockedheight, etc.
-    content = re.sub(
-        r"(set trans\.size\s+\* Scale )\[1000 \d+\]",
-        f"\\1[1000 {TRANSPORT_HEIGHT}]",
-        content
-    )
-    content = re.sub(
-        r"(set trans\.size\.dockedheight\s+\* Scale )\[\d+\]",
-        f"\\1[{TRANSPORT_HEIGHT}]",
-        content
-    )
+    config.set_bracket("trans.size", 0, [1000, TRANSPORT_HEIGHT], scope)
+    config.set_bracket("trans.size.dockedheight", 0, [TRANSPORT_HEIGHT], scope)
     
     # Update sectionLeft height (used as reference)
-    content = re.sub(
-        r"(set trans\.custom\.sectionLeft\s+\* Scale )\[0 0 1000 \d+\]",
-        f"\\1[0 0 1000 {TRANSPORT_HEIGHT}]",
-        content
+    config.replace_bracket(
+        "trans.custom.sectionLeft", [0, 0, 1000, 36], [0, 0, 1000, TRANSPORT_HEIGHT], scope
     )
     
-    # Update status section height - replace all 36 with TRANSPORT_HEIGHT in status lines
-    # Pattern: [transMargin 0 transStatusWidth{0} 36] -> [transMargin 0 transStatusWidth{0} 48]
-    content = re.sub(
-        r"(\[transMargin 0 transStatusWidth\{0\}) 36\]",
-        f"\\1 {TRANSPORT_HEIGHT}]",
-        content
+    # Update status section height
+    # [transMargin 0 transStatusWidth{0} 36] -> [transMargin 0 transStatusWidth{0} 40]
+    config.replace_bracket(
+        "trans.custom.sectionStatus",
+        "[transMargin 0 transStatusWidth{0} 36]",
+        f"[transMargin 0 transStatusWidth{{0}} {TRANSPORT_HEIGHT}]", scope,
     )
-    # Pattern: [0 36 transStatusWidth{0} 36] -> [0 6 transStatusWidth{0} 36] (y-offset 6 to center 36 in 48)
-    content = re.sub(
-        r"\[0 36 transStatusWidth\{0\} 36\]",
-        f"[0 6 transStatusWidth{{0}} 36]",
-        content
+    # [0 36 transStatusWidth{0} 36] -> [0 6 transStatusWidth{0} 36] (y-offset 6 when wrapped)
+    config.replace_bracket(
+        "trans.custom.sectionStatus",
+        "[0 36 transStatusWidth{0} 36]", "[0 6 transStatusWidth{0} 36]", scope,
     )
     # Update minmax height
-    content = re.sub(
-        r"(set trans\.size\.minmax\s+\* Scale \+ \[100) 36 (2000) 144\]",
-        f"\\1 {TRANSPORT_HEIGHT} \\2 {TRANSPORT_HEIGHT * 3}]",
-        content
+    config.replace_bracket(
+        "trans.size.minmax", [100, 36, 2000, 144],
+        [100, TRANSPORT_HEIGHT, 2000, TRANSPORT_HEIGHT * 3], scope,
     )
     
     # Update right sections (BPM, Sig, Sel) - height from 36 to TRANSPORT_HEIGHT
-    # Pattern: transFollow trans.custom.sectionBpm 60 36 -> 60 48
-    content = re.sub(r"(transFollow trans\.custom\.sectionBpm\s+\d+) 36", f"\\1 {TRANSPORT_HEIGHT}", content)
-    content = re.sub(r"(transFollow trans\.custom\.sectionSig\s+\d+) 36", f"\\1 {TRANSPORT_HEIGHT}", content)
-    content = re.sub(r"(transFollow trans\.custom\.sectionSel\s+transSelectionWidth\{0\}) 36", f"\\1 {TRANSPORT_HEIGHT}", content)
+    # transFollow trans.custom.sectionBpm 78 36 -> 78 40
+    for section in ["sectionBpm", "sectionSig", "sectionSel"]:
+        config.set_call_arg("transFollow", f"trans.custom.{section}", 1, TRANSPORT_HEIGHT, scope)
     
     # Update previous reference for right sections
-    content = re.sub(r"(set previous\s+\+ \[w trans\.custom\.sectionRight\] \* Scale \[0 0 0) 36\]", f"\\1 {TRANSPORT_HEIGHT}]", content)
+    config.replace_bracket("previous", [0, 0, 0, 36], [0, 0, 0, TRANSPORT_HEIGHT], scope)
     
-    # Update the conditional y-offset for right section
-    content = re.sub(r"(\[0 36\] \[0 transMargin)", f"[0 {TRANSPORT_HEIGHT}] [0 transMargin", content)
+    # Update the row-wrap y-offset in transFollow
+    config.replace_bracket("this", [0, 36], [0, TRANSPORT_HEIGHT], "transFollow")
     
-    # Update transport status background color - lighter (51,51,51 -> 70,70,70)
-    content = re.sub(
-        r"(\[0 0 0 0) 51 51 51 (255\])",
-        r"\1 70 70 70 \2",
-        content
+    # Update transport status background color - lighter (51,51,51 -> 70,70,70).
+    # The colour is built from the transStatusCol* parameters, so this literal
+    # bracket is not in the theme: it is reported as a miss and the shipped
+    # colour stays 51, as it always has.
+    config.replace_bracket(
+        "trans.status.color", [0, 0, 0, 0, 51, 51, 51, 255],
+        [0, 0, 0, 0, STATUS_COLOR, STATUS_COLOR, STATUS_COLOR, 255], scope,
     )
     
-    with open(RTCONFIG_PATH, 'w') as f:
-        f.write(content)
+    write_file(RTCONFIG_PATH, config.serialize().encode())
     
+    if config.missing:
+        print(f"⚠ {len(config.missing)} rtconfig targets not found:")
+        for target in config.missing:
+            print(f"    - {target}")
     print(f"✓ Updated rtconfig.txt")
     print(f"  Transport height: {TRANSPORT_HEIGHT}px")
     print(f"  Button size: {BUTTON_WIDTH}x{BUTTON_HEIGHT}px")
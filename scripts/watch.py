@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+File watching for build_all.py --watch.
+
+On Linux, changes are reported by inotify (through ctypes, no extra
+dependency): every directory under the watched roots gets a watch, and
+directories created later are added as they appear. Elsewhere, or when
+inotify is unavailable or out of watches, the roots are polled by size
+and mtime instead.
+
+wait() blocks until something changes, then keeps collecting until the
+tree has been quiet for the debounce interval, so a burst of saves (an
+editor's write + rename, a batch export of icons) triggers one rebuild.
+
+Usage:
+    python scripts/watch.py assets theme_source     # print debounced changes
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+# Quiet period that ends a burst of changes
+DEBOUNCE_SECONDS = 0.3
+
+# Polling interval of the fallback watcher
+POLL_SECONDS = 0.5
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF)
+
+_EVENT = struct.Struct("iIII")
+
+
+def ignored(name):
+    """Editor droppings, caches and temporary files that never trigger a build."""
+    return (name.startswith((".", "#")) or name.endswith(("~", ".tmp", ".swp", ".pyc"))
+            or name == "__pycache__")
+
+
+def _directories(root):
+    """root and every directory below it, skipping ignored ones."""
+    found = [root]
+    for folder, dirs, _ in os.walk(root):
+        dirs[:] = [d for d in dirs if not ignored(d)]
+        found += [os.path.join(folder, d) for d in dirs]
+    return found
+
+
+class _Roots:
+    """Watched roots: directories (recursive) and single files."""
+
+    def __init__(self, roots):
+        self.dirs = []
+        self.files = set()
+        for root in roots:
+            root = os.path.abspath(root)
+            if os.path.isdir(root):
+                self.dirs.append(root)
+            else:
+                self.files.add(root)
+
+    def wanted(self, path):
+        if ignored(os.path.basename(path)):
+            return False
+        if path in self.files:
+            return True
+        return any(path == d or path.startswith(d + os.sep) for d in self.dirs)
+
+
+class InotifyWatcher:
+    """Recursive inotify watcher."""
+
+    kind = "inotify"
+
+    def __init__(self, roots):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.roots = _Roots(roots)
+        self._wds = {}  # watch descriptor -> directory
+        try:
+            for root in self.roots.dirs:
+                for folder in _directories(root):
+                    self._watch(folder)
+            # Single files are watched through their directory (editors replace them)
+            for path in self.roots.files:
+                self._watch(os.path.dirname(path))
+        except BaseException:
+            # e.g. ENOSPC (out of watches): open_watcher falls back to polling
+            os.close(self._fd)
+            raise
+
+    def _watch(self, folder):
+        wd = self._add_watch(self._fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(err, f"inotify_add_watch failed for {folder}")
+        self._wds[wd] = folder
+
+    def _read(self, timeout):
+        """Changed paths from the events available within timeout."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return None
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: report every root as changed
+                changed.update(self.roots.dirs)
+                changed.update(self.roots.files)
+                continue
+            folder = self._wds.get(wd)
+            if folder is None or mask & IN_IGNORED:
+                self._wds.pop(wd, None)
+                continue
+            path = os.path.join(folder, name) if name else folder
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and self.roots.wanted(path):
+                    # A new directory: watch it, and report what it already holds
+                    for sub in _directories(path):
+                        self._watch(sub)
+                        changed.update(
+                            os.path.join(sub, f) for f in os.listdir(sub)
+                            if os.path.isfile(os.path.join(sub, f))
+                        )
+                continue
+            if mask & IN_CREATE:
+                # Wait for the close-write that follows
+                continue
+            if self.roots.wanted(path):
+                changed.add(path)
+        return {p for p in changed if self.roots.wanted(p)}
+
+    def wait(self, debounce=DEBOUNCE_SECONDS):
+        """Block until files change; returns the debounced set of paths."""
+        changed = set()
+        while not changed:
+            changed = self._read(None) or set()
+        while True:
+            more = self._read(debounce)
+            if more is None:
+                return changed
+            changed |= more
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Fallback watcher comparing size and mtime snapshots."""
+
+    kind = "polling"
+
+    def __init__(self, roots, interval=POLL_SECONDS):
+        self.roots = _Roots(roots)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        paths = list(self.roots.files)
+        for root in self.roots.dirs:
+            for folder in _directories(root):
+                try:
+                    entries = list(os.scandir(folder))
+                except FileNotFoundError:
+                    continue
+                paths += [e.path for e in entries if e.is_file() and not ignored(e.name)]
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def _changes(self):
+        current = self._scan()
+        previous, self._snapshot = self._snapshot, current
+        return {p for p in previous.keys() | current.keys() if previous.get(p) != current.get(p)}
+
+    def wait(self, debounce=DEBOUNCE_SECONDS):
+        """Block until files change; returns the debounced set of paths."""
+        changed = set()
+        while not changed:
+            time.sleep(self.interval)
+            changed = self._changes()
+        while True:
+            time.sleep(max(debounce, self.interval))
+            more = self._changes()
+            if not more:
+                return changed
+            changed |= more
+
+    def close(self):
+        pass
+
+
+def open_watcher(roots, poll=False):
+    """inotify watcher for roots, or a polling one if inotify is unavailable."""
+    if not poll:
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print debounced file changes")
+    parser.add_argument("roots", nargs="+", type=Path, help="Directories or files to watch")
+    parser.add_argument("--poll", action="store_true", help="Poll instead of using inotify")
+    args = parser.parse_args()
+
+    watcher = open_watcher(args.roots, args.poll)
+    print(f"Watching {len(args.roots)} roots ({watcher.kind}); Ctrl+C to stop")
+    try:
+        while True:
+            for path in sorted(watcher.wait()):
+                print(f"  {path}")
+            print("  --")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+if __name__ == "__main__":
+    main()